@@ -1,3 +1,4 @@
+import logging
 import os
 import sqlite3
 from datetime import datetime, timedelta, timezone
@@ -5,11 +6,34 @@ from functools import wraps
 from pathlib import Path
 
 from flask import Flask, jsonify, request, g
+from flask.logging import default_handler
 from flask_cors import CORS
 from dotenv import load_dotenv
 from openai import OpenAI
 import jwt
 
+from change_capture import ensure_change_capture
+from chat_retrieval import ChatRetriever, StageTimer, format_context
+from db_maintenance import MaintenanceScheduler, log_report, start_background_maintenance
+from portal_analytics import active_student_rows, ensure_analytics, merge_analytics, query_analytics
+from portal_assets import belt_materials, belt_slug, current_week_theme, load_asset_manifest
+from portal_responses import json_response
+from portal_sessions import (
+    RefreshTokenError,
+    ensure_session_schema,
+    issue_refresh_token,
+    prune_refresh_tokens,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
+from portal_search import (
+    refresh_search_index,
+    search_materials,
+    start_background_refresh,
+)
+from portal_shards import DEFAULT_SHARD, ShardRouter
+from roster_index import RosterIndex
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -19,22 +43,69 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 DATABASE_PATH = Path(os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent / "portal.db"))
 ADMIN_PORTAL_KEY = os.getenv("ADMIN_PORTAL_KEY")
+# Same fallback as the Worker's getKioskSecret(): the admin key also unlocks kiosk routes.
+KIOSK_PORTAL_KEY = (os.getenv("KIOSK_PORTAL_KEY") or ADMIN_PORTAL_KEY or "").strip()
 JWT_SECRET = os.getenv("PORTAL_JWT_SECRET") or ADMIN_PORTAL_KEY
 try:
     JWT_EXP_MINUTES = int(os.getenv("PORTAL_JWT_EXP_MINUTES", "1440"))
 except ValueError:
     JWT_EXP_MINUTES = 1440
 JWT_ALGORITHM = "HS256"
+CHAT_MODEL = "gpt-3.5-turbo"
+CHAT_SYSTEM_PROMPT = "You are a helpful assistant for Master Ara's Martial Arts."
+CHAT_CONTEXT_PROMPT = (
+    "Answer using the excerpts from the school's study materials below when they are relevant. "
+    "If they do not cover the question, say so rather than guessing about belt requirements."
+)
+try:
+    CHAT_RETRIEVAL_BUDGET_MS = float(os.getenv("CHAT_RETRIEVAL_BUDGET_MS", "150"))
+except ValueError:
+    CHAT_RETRIEVAL_BUDGET_MS = 150
+try:
+    CHAT_RETRIEVAL_TOP_K = int(os.getenv("CHAT_RETRIEVAL_TOP_K", "4"))
+except ValueError:
+    CHAT_RETRIEVAL_TOP_K = 4
+try:
+    CHAT_CONTEXT_MAX_TOKENS = int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", "800"))
+except ValueError:
+    CHAT_CONTEXT_MAX_TOKENS = 800
+try:
+    MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("PORTAL_MAINTENANCE_INTERVAL", "0"))
+except ValueError:
+    MAINTENANCE_INTERVAL_SECONDS = 0
+BACKUP_DIR = Path(os.getenv("PORTAL_BACKUP_DIR")) if os.getenv("PORTAL_BACKUP_DIR") else None
+try:
+    REFRESH_TTL_DAYS = int(os.getenv("PORTAL_REFRESH_TTL_DAYS", "30"))
+except ValueError:
+    REFRESH_TTL_DAYS = 30
+try:
+    REFRESH_MAX_DAYS = int(os.getenv("PORTAL_REFRESH_MAX_DAYS", "90"))
+except ValueError:
+    REFRESH_MAX_DAYS = 90
+SHARDS = ShardRouter.from_env(
+    DATABASE_PATH,
+    os.getenv("PORTAL_SHARDS"),
+    os.getenv("PORTAL_SHARD_PREFIXES"),
+)
 
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def get_db_connection(student_id=None):
+    """Open the shard that owns ``student_id`` (the default shard when omitted)."""
+    return SHARDS.connect_for(student_id)
 
 
 def init_db():
-    with get_db_connection() as conn:
+    for shard in SHARDS.names:
+        init_shard(shard)
+    SHARDS.ensure_directory()
+    with SHARDS.connect(DEFAULT_SHARD) as conn:
+        ensure_session_schema(conn)
+        prune_refresh_tokens(conn)
+        refresh_search_index(conn)
+
+
+def init_shard(shard):
+    with SHARDS.connect(shard) as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS login_events (
@@ -81,13 +152,15 @@ def init_db():
         )
         conn.execute("CREATE INDEX IF NOT EXISTS idx_students_id ON students(id)")
         conn.commit()
+        ensure_change_capture(conn)
+        ensure_analytics(conn)
 
 
-def find_student_record(student_id):
+def find_student_record(student_id, conn=None):
     if not student_id:
         return None
     lookup = student_id.strip().lower()
-    with get_db_connection() as conn:
+    with conn or get_db_connection(lookup) as conn:
         row = conn.execute(
             """
             SELECT id, name, birth_date, phone, email, current_belt, is_suspended, suspended_reason, suspended_at
@@ -138,8 +211,8 @@ def issue_portal_token(student_id):
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def fetch_portal_progress(student_id):
-    with get_db_connection() as conn:
+def fetch_portal_progress(student_id, conn=None):
+    with conn or get_db_connection(student_id) as conn:
         rows = conn.execute(
             """
             SELECT belt_slug, file_name, uploaded_at
@@ -160,6 +233,25 @@ def fetch_portal_progress(student_id):
     ]
 
 
+def build_chat_messages(user_message, context=None):
+    system_prompt = CHAT_SYSTEM_PROMPT
+    if context:
+        system_prompt = f"{CHAT_SYSTEM_PROMPT}\n\n{CHAT_CONTEXT_PROMPT}\n\n{format_context(context)}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def log_chat_timings(timer, context):
+    app.logger.info(
+        "chat timings %s sections=%d retrieval=%s",
+        timer.stages,
+        len(context),
+        CHAT_RETRIEVER.stats(),
+    )
+
+
 def require_portal_auth(view_func):
     @wraps(view_func)
     def wrapper(*args, **kwargs):
@@ -189,8 +281,34 @@ def require_portal_auth(view_func):
 
 
 # Initialize database immediately on module load
-DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
+for shard_path in SHARDS.paths.values():
+    shard_path.parent.mkdir(parents=True, exist_ok=True)
 init_db()
+ROSTER_INDEX = RosterIndex(SHARDS)
+CHAT_RETRIEVER = ChatRetriever(
+    SHARDS.connect,
+    budget_seconds=CHAT_RETRIEVAL_BUDGET_MS / 1000,
+    top_k=CHAT_RETRIEVAL_TOP_K,
+    max_context_tokens=CHAT_CONTEXT_MAX_TOKENS,
+)
+# /chat only reads the index; keep it current (and drop stale cached context)
+# without waiting for someone to call /portal/search.
+start_background_refresh(SHARDS.connect, CHAT_RETRIEVER.clear)
+
+if MAINTENANCE_INTERVAL_SECONDS > 0:
+    # app.logger only emits warnings outside debug mode; the maintenance reports
+    # (durations, pages copied) are INFO, so give them their own logger.
+    maintenance_logger = logging.getLogger("portal.maintenance")
+    maintenance_logger.setLevel(logging.INFO)
+    if not maintenance_logger.handlers:
+        maintenance_logger.addHandler(default_handler)
+    start_background_maintenance(
+        [
+            MaintenanceScheduler(path, backup_dir=BACKUP_DIR, report=log_report)
+            for path in SHARDS.paths.values()
+        ],
+        MAINTENANCE_INTERVAL_SECONDS
+    )
 
 
 @app.route('/')
@@ -199,22 +317,35 @@ def home():
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    user_message = request.json.get('message')
+    payload = request.get_json(silent=True)
+    user_message = payload.get('message') if isinstance(payload, dict) else None
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
+    if not isinstance(user_message, str):
+        return jsonify({"error": "message must be a string"}), 400
+
+    timer = StageTimer()
+    with timer.stage("retrieve"):
+        context = CHAT_RETRIEVER.retrieve(user_message)
+    with timer.stage("prompt"):
+        messages = build_chat_messages(user_message, context)
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant for Master Ara's Martial Arts."},
-                {"role": "user", "content": user_message}
-            ]
-        )
+        with timer.stage("generate"):
+            response = client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=messages
+            )
         llm_response = response.choices[0].message.content
-        return jsonify({"response": llm_response})
+        result = jsonify({"response": llm_response})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        result = jsonify({"error": str(e)}), 500
+    finally:
+        log_chat_timings(timer, context)
+
+    reply = app.make_response(result)
+    reply.headers["Server-Timing"] = timer.server_timing()
+    return reply
 
 
 def is_authorized_admin(inbound_request):
@@ -225,6 +356,14 @@ def is_authorized_admin(inbound_request):
     return bool(provided and provided == ADMIN_PORTAL_KEY)
 
 
+def is_authorized_kiosk(inbound_request):
+    if not KIOSK_PORTAL_KEY:
+        return False
+
+    provided = inbound_request.headers.get("X-Kiosk-Key") or ""
+    return provided == KIOSK_PORTAL_KEY
+
+
 @app.route("/portal/login-event", methods=["POST"])
 def record_portal_event():
     payload = request.get_json(silent=True) or {}
@@ -238,6 +377,7 @@ def record_portal_event():
 
     is_login_attempt = action == "login"
     token = None
+    refresh_token = None
     student = None
     progress_snapshot = None
     student_profile = None
@@ -272,7 +412,7 @@ def record_portal_event():
     timestamp = datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(student_id) as conn:
             conn.execute(
                 "INSERT INTO login_events (student_id, action, actor, created_at) VALUES (?, ?, ?, ?)",
                 (student_id, action, actor, timestamp)
@@ -281,15 +421,74 @@ def record_portal_event():
     except sqlite3.Error as error:
         return jsonify({"error": f"Failed to record event: {error}"}), 500
 
+    if token:
+        try:
+            with SHARDS.connect(DEFAULT_SHARD) as conn:
+                refresh_token = issue_refresh_token(
+                    conn,
+                    canonical_id,
+                    REFRESH_TTL_DAYS * 86400,
+                    REFRESH_MAX_DAYS * 86400
+                )
+        except sqlite3.Error as error:
+            return jsonify({"error": f"Failed to start session: {error}"}), 500
+
     response_payload = {"ok": True, "recordedAt": timestamp}
     if token:
         response_payload["token"] = token
+        response_payload["refreshToken"] = refresh_token
+        response_payload["expiresIn"] = JWT_EXP_MINUTES * 60
         response_payload["student"] = student_profile
         response_payload["progress"] = progress_snapshot
 
     return jsonify(response_payload)
 
 
+@app.route("/portal/token/refresh", methods=["POST"])
+def refresh_portal_token():
+    if not JWT_SECRET:
+        return jsonify({"error": "Server auth misconfiguration"}), 503
+
+    payload = request.get_json(silent=True) or {}
+    presented = (payload.get("refreshToken") or "").strip()
+    if not presented:
+        return jsonify({"error": "refreshToken is required"}), 400
+
+    try:
+        with SHARDS.connect(DEFAULT_SHARD) as conn:
+            student_id, refresh_token = rotate_refresh_token(conn, presented, REFRESH_TTL_DAYS * 86400)
+    except RefreshTokenError as error:
+        return jsonify({"error": str(error)}), 401
+    except sqlite3.Error as error:
+        return jsonify({"error": f"Failed to refresh session: {error}"}), 500
+
+    return jsonify(
+        {
+            "token": issue_portal_token(student_id),
+            "refreshToken": refresh_token,
+            "expiresIn": JWT_EXP_MINUTES * 60
+        }
+    )
+
+
+@app.route("/portal/token/revoke", methods=["POST"])
+def revoke_portal_token():
+    payload = request.get_json(silent=True) or {}
+    presented = (payload.get("refreshToken") or "").strip()
+    if not presented:
+        return jsonify({"error": "refreshToken is required"}), 400
+
+    try:
+        with SHARDS.connect(DEFAULT_SHARD) as conn:
+            revoke_refresh_token(conn, presented)
+    except RefreshTokenError as error:
+        return jsonify({"error": str(error)}), 400
+    except sqlite3.Error as error:
+        return jsonify({"error": f"Failed to revoke session: {error}"}), 500
+
+    return jsonify({"ok": True})
+
+
 @app.route("/portal/progress/<student_id>", methods=["GET"])
 @require_portal_auth
 def get_portal_progress(student_id):
@@ -324,6 +523,102 @@ def get_portal_profile():
     return jsonify({"student": sanitize_student_record(student)})
 
 
+@app.route("/portal/bootstrap", methods=["GET"])
+@require_portal_auth
+def get_portal_bootstrap():
+    student_id = (g.portal_claims.get("sub") or "").strip()
+    if not student_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        with get_db_connection(student_id) as conn:
+            student = find_student_record(student_id, conn=conn)
+            if not student:
+                return jsonify({"error": "Student not found"}), 404
+            records = fetch_portal_progress(student_id, conn=conn)
+    except sqlite3.Error as error:
+        return jsonify({"error": f"Failed to load portal data: {error}"}), 500
+
+    slug = belt_slug(student.get("currentBelt"))
+    generated_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    return json_response(
+        {
+            "student": sanitize_student_record(student),
+            "progress": {"records": records, "generatedAt": generated_at},
+            "weekTheme": current_week_theme(),
+            "belt": {"slug": slug, "materials": belt_materials(slug)},
+            "generatedAt": generated_at
+        }
+    )
+
+
+@app.route("/portal/search", methods=["GET"])
+def search_portal_materials():
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+
+    belt = belt_slug(request.args.get("belt"))
+    raw_limit = request.args.get("limit", "10")
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        limit = 10
+
+    try:
+        with get_db_connection() as conn:
+            results = search_materials(conn, query, belt=belt, limit=limit)
+    except sqlite3.Error as error:
+        return jsonify({"error": f"Search failed: {error}"}), 500
+
+    return json_response({"query": query, "belt": belt, "results": results})
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def public_asset_manifest(manifest):
+    assets = {
+        relative: {key: value for key, value in entry.items() if key != "mtimeNs"}
+        for relative, entry in (manifest.get("assets") or {}).items()
+    }
+    return {
+        "version": manifest.get("version"),
+        "generatedAt": manifest.get("generatedAt"),
+        "assets": assets,
+        "belts": manifest.get("belts") or {},
+    }
+
+
+@app.route("/portal/assets/manifest", methods=["GET"])
+def get_asset_manifest():
+    manifest = load_asset_manifest()
+    if not manifest:
+        return jsonify({"error": "Asset manifest has not been built"}), 404
+
+    # The unversioned URL must revalidate; clients then pin the versioned one.
+    etag = f'"{manifest.get("version")}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = app.response_class(status=304)
+    else:
+        response = json_response(public_asset_manifest(manifest))
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/portal/assets/manifest/<version>", methods=["GET"])
+def get_versioned_asset_manifest(version):
+    manifest = load_asset_manifest()
+    if not manifest or manifest.get("version") != version:
+        return jsonify({"error": "Unknown manifest version"}), 404
+
+    response = json_response(public_asset_manifest(manifest))
+    response.headers["ETag"] = f'"{version}"'
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
 @app.route("/portal/progress", methods=["POST"])
 @require_portal_auth
 def save_portal_progress():
@@ -349,7 +644,7 @@ def save_portal_progress():
     created_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(student_id) as conn:
             conn.execute(
                 """
                 INSERT INTO belt_progress (student_id, belt_slug, file_name, uploaded_at, created_at)
@@ -368,57 +663,64 @@ def save_portal_progress():
     return jsonify({"ok": True, "beltSlug": belt_slug, "uploadedAt": iso_timestamp})
 
 
-@app.route("/portal/admin/activity", methods=["GET"])
-def portal_activity():
-    if not is_authorized_admin(request):
+@app.route("/portal/admin/students/search", methods=["GET"])
+def search_roster():
+    # Used by both the admin panel (X-Admin-Key) and kiosk.html (X-Kiosk-Key).
+    if not (is_authorized_admin(request) or is_authorized_kiosk(request)):
         return jsonify({"error": "Unauthorized"}), 401
 
-    raw_limit = request.args.get("limit", "200")
+    query = (request.args.get("q") or "").strip()
+    raw_limit = request.args.get("limit", "10")
     try:
-        limit = max(1, min(1000, int(raw_limit)))
+        limit = int(raw_limit)
     except ValueError:
-        limit = 200
+        limit = 10
 
     try:
-        with get_db_connection() as conn:
-            events = conn.execute(
-                """
-                SELECT student_id, action, actor, created_at
-                FROM login_events
-                ORDER BY datetime(created_at) DESC
-                LIMIT ?
-                """,
-                (limit,)
-            ).fetchall()
-
-            summaries = conn.execute(
-                """
-                SELECT
-                    le.student_id,
-                    COUNT(*) AS total_events,
-                    SUM(CASE WHEN le.action = 'login' THEN 1 ELSE 0 END) AS login_events,
-                    MAX(le.created_at) AS last_event,
-                    (
-                        SELECT bp.belt_slug
-                        FROM belt_progress bp
-                        WHERE bp.student_id = le.student_id
-                        ORDER BY datetime(bp.uploaded_at) DESC
-                        LIMIT 1
-                    ) AS latest_belt,
-                    (
-                        SELECT bp.uploaded_at
-                        FROM belt_progress bp
-                        WHERE bp.student_id = le.student_id
-                        ORDER BY datetime(bp.uploaded_at) DESC
-                        LIMIT 1
-                    ) AS latest_belt_uploaded
-                FROM login_events le
-                GROUP BY le.student_id
-                ORDER BY datetime(last_event) DESC
-                """
-            ).fetchall()
+        ROSTER_INDEX.refresh()
     except sqlite3.Error as error:
-        return jsonify({"error": f"Failed to fetch activity: {error}"}), 500
+        return jsonify({"error": f"Failed to refresh roster index: {error}"}), 500
+
+    return json_response({"query": query, "results": ROSTER_INDEX.search(query, limit=limit)})
+
+
+def fetch_shard_activity(conn, limit):
+    events = conn.execute(
+        """
+        SELECT student_id, action, actor, created_at
+        FROM login_events
+        ORDER BY datetime(created_at) DESC
+        LIMIT ?
+        """,
+        (limit,)
+    ).fetchall()
+
+    summaries = conn.execute(
+        """
+        SELECT
+            le.student_id,
+            COUNT(*) AS total_events,
+            SUM(CASE WHEN le.action = 'login' THEN 1 ELSE 0 END) AS login_events,
+            MAX(le.created_at) AS last_event,
+            (
+                SELECT bp.belt_slug
+                FROM belt_progress bp
+                WHERE bp.student_id = le.student_id
+                ORDER BY datetime(bp.uploaded_at) DESC
+                LIMIT 1
+            ) AS latest_belt,
+            (
+                SELECT bp.uploaded_at
+                FROM belt_progress bp
+                WHERE bp.student_id = le.student_id
+                ORDER BY datetime(bp.uploaded_at) DESC
+                LIMIT 1
+            ) AS latest_belt_uploaded
+        FROM login_events le
+        GROUP BY le.student_id
+        ORDER BY datetime(last_event) DESC
+        """
+    ).fetchall()
 
     event_payload = [
         {
@@ -441,6 +743,53 @@ def portal_activity():
         }
         for row in summaries
     ]
+    return event_payload, summary_payload
+
+
+def merge_shard_activity(shard_results, limit):
+    events = []
+    summaries = {}
+    for shard_events, shard_summaries in shard_results:
+        events.extend(shard_events)
+        for summary in shard_summaries:
+            key = (summary["studentId"] or "").lower()
+            existing = summaries.get(key)
+            if not existing:
+                summaries[key] = dict(summary)
+                continue
+            # A student moved between locations keeps history in both shards.
+            existing["totalEvents"] += summary["totalEvents"]
+            existing["loginEvents"] += summary["loginEvents"]
+            if (summary["lastEventAt"] or "") > (existing["lastEventAt"] or ""):
+                existing["lastEventAt"] = summary["lastEventAt"]
+            if (summary["latestBeltUploadedAt"] or "") > (existing["latestBeltUploadedAt"] or ""):
+                existing["latestBelt"] = summary["latestBelt"]
+                existing["latestBeltUploadedAt"] = summary["latestBeltUploadedAt"]
+
+    events.sort(key=lambda event: event["recordedAt"] or "", reverse=True)
+    merged_summaries = sorted(
+        summaries.values(), key=lambda summary: summary["lastEventAt"] or "", reverse=True
+    )
+    return events[:limit], merged_summaries
+
+
+@app.route("/portal/admin/activity", methods=["GET"])
+def portal_activity():
+    if not is_authorized_admin(request):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    raw_limit = request.args.get("limit", "200")
+    try:
+        limit = max(1, min(1000, int(raw_limit)))
+    except ValueError:
+        limit = 200
+
+    try:
+        shard_results = SHARDS.scatter(lambda conn: fetch_shard_activity(conn, limit))
+    except sqlite3.Error as error:
+        return jsonify({"error": f"Failed to fetch activity: {error}"}), 500
+
+    event_payload, summary_payload = merge_shard_activity(shard_results.values(), limit)
 
     return jsonify(
         {
@@ -451,5 +800,37 @@ def portal_activity():
     )
 
 
+@app.route("/portal/admin/analytics", methods=["GET"])
+def portal_analytics():
+    if not is_authorized_admin(request):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    bucket = (request.args.get("bucket") or "day").strip().lower()
+    start = request.args.get("from")
+    end = request.args.get("to")
+    # A student's events can sit in several shards; only then recount active
+    # students from the per-student rows instead of trusting the rollup counts.
+    recount = len(SHARDS.paths) > 1
+
+    def shard_analytics(conn):
+        result = query_analytics(conn, bucket, start=start, end=end)
+        rows = active_student_rows(conn, bucket, result["from"], result["to"]) if recount else []
+        return result, rows
+
+    try:
+        shard_results = list(SHARDS.scatter(shard_analytics).values())
+        result = merge_analytics(
+            [result for result, _ in shard_results],
+            active_rows=[row for _, rows in shard_results for row in rows] if recount else None,
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    except sqlite3.Error as error:
+        return jsonify({"error": f"Failed to fetch analytics: {error}"}), 500
+
+    result["generatedAt"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    return json_response(result)
+
+
 if __name__ == '__main__':
     app.run(debug=True)
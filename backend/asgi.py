@@ -0,0 +1,217 @@
+"""
+ASGI entry point for the backend.
+
+    uvicorn asgi:application --app-dir backend --port 5000
+
+``POST /chat`` is served natively on the event loop with the async OpenAI
+client, so a slow upstream answer holds a coroutine instead of a worker
+thread. Every other route (and the /chat CORS preflight) is passed to the
+existing Flask app, which runs on a bounded thread pool. That keeps the
+SQLite work off the event loop and keeps routes, auth checks and error
+payloads identical to the WSGI deployment.
+
+Chat retrieval uses the same ``portal_app.CHAT_RETRIEVER`` as the Flask route.
+Cache hits are answered on the loop; misses run on the pool, and the wait for
+a free worker counts against the retrieval budget, so a busy pool costs the
+answer its context rather than delaying it.
+
+``PORTAL_ASGI_WORKERS`` (default 8) caps the threads used for the Flask and
+SQLite work.
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+import app as portal_app
+from chat_retrieval import StageTimer
+
+try:
+    ASGI_WORKERS = max(1, int(os.getenv("PORTAL_ASGI_WORKERS", "8")))
+except ValueError:
+    ASGI_WORKERS = 8
+
+EXECUTOR = ThreadPoolExecutor(max_workers=ASGI_WORKERS, thread_name_prefix="portal-wsgi")
+chat_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+async def run_blocking(func, *args):
+    """Run SQLite or other blocking work on the bounded executor."""
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR, func, *args)
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def send_response(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(
+    send,
+    payload: Dict[str, Any],
+    status: int = 200,
+    extra_headers: Optional[List[Tuple[bytes, bytes]]] = None,
+) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("ascii")),
+        (b"access-control-allow-origin", b"*"),
+    ]
+    await send_response(send, status, headers + (extra_headers or []), body)
+
+
+def build_environ(scope, body: bytes) -> Dict[str, Any]:
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name in ("CONTENT_LENGTH", "TRANSFER_ENCODING"):
+            continue  # the body is already de-chunked; its length is set below
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is fully buffered, so chunked uploads get a length too.
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+def call_wsgi(environ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    response: Dict[str, Any] = {}
+    chunks: List[bytes] = []
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+        ]
+        return chunks.append
+
+    result = portal_app.app(environ, start_response)
+    try:
+        for chunk in result:
+            chunks.append(chunk)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], b"".join(chunks)
+
+
+async def retrieve_context(question: str) -> List[Dict[str, Any]]:
+    retriever = portal_app.CHAT_RETRIEVER
+    context = retriever.cached(question)
+    if context is not None:
+        return context
+    try:
+        return await asyncio.wait_for(run_blocking(retriever.retrieve, question), retriever.budget_seconds)
+    except asyncio.TimeoutError:
+        return []
+
+
+def is_json_request(scope) -> bool:
+    """Same rule as Werkzeug's ``Request.is_json``, which gates ``get_json(silent=True)``."""
+    for raw_name, raw_value in scope.get("headers", []):
+        if raw_name.lower() == b"content-type":
+            mimetype = raw_value.decode("latin-1").split(";", 1)[0].strip().lower()
+            return mimetype == "application/json" or (
+                mimetype.startswith("application/") and mimetype.endswith("+json")
+            )
+    return False
+
+
+async def chat(scope, receive, send) -> None:
+    body = await read_body(receive)
+    payload = {}
+    if is_json_request(scope):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            pass
+    user_message = payload.get("message") if isinstance(payload, dict) else None
+    if not user_message:
+        await send_json(send, {"error": "No message provided"}, 400)
+        return
+    if not isinstance(user_message, str):
+        await send_json(send, {"error": "message must be a string"}, 400)
+        return
+
+    timer = StageTimer()
+    with timer.stage("retrieve"):
+        context = await retrieve_context(user_message)
+    with timer.stage("prompt"):
+        messages = portal_app.build_chat_messages(user_message, context)
+
+    try:
+        with timer.stage("generate"):
+            response = await chat_client.chat.completions.create(
+                model=portal_app.CHAT_MODEL,
+                messages=messages,
+            )
+        payload, status = {"response": response.choices[0].message.content}, 200
+    except Exception as e:
+        payload, status = {"error": str(e)}, 500
+    portal_app.log_chat_timings(timer, context)
+    await send_json(send, payload, status, [(b"server-timing", timer.server_timing().encode("ascii"))])
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            EXECUTOR.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    if scope["path"] == "/chat" and scope["method"] == "POST":
+        await chat(scope, receive, send)
+        return
+
+    body = await read_body(receive)
+    status, headers, payload = await run_blocking(call_wsgi, build_environ(scope, body))
+    await send_response(send, status, headers, payload)
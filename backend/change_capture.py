@@ -0,0 +1,124 @@
+"""
+Trigger-based change capture for the portal tables that are mirrored to D1.
+
+Every insert/update/delete on ``students``, ``belt_progress`` and
+``login_events`` appends the row's natural key to ``change_log``. The D1 sync
+tool (``scripts/sync_d1.py``) reads the log past its high-water mark, so a sync
+only touches rows that changed instead of re-sending the whole roster.
+
+``students`` and ``belt_progress`` are keyed by their natural keys because D1
+assigns its own AUTOINCREMENT ids. ``login_events`` has no natural key (two
+logins in the same second are separate events), so it is keyed by the local
+``id``; the sync tool turns that into a stable ``origin_id`` column in D1.
+"""
+
+import sqlite3
+from typing import Dict, List
+
+# Columns mirrored to D1 per table, with the natural key columns first.
+SYNC_TABLES: Dict[str, Dict[str, List[str]]] = {
+    "students": {
+        "key": ["id"],
+        "columns": [
+            "id", "name", "birth_date", "phone", "email", "current_belt", "is_suspended",
+            "suspended_reason", "suspended_at", "created_at", "updated_at",
+        ],
+    },
+    "belt_progress": {
+        "key": ["student_id", "belt_slug"],
+        "columns": ["student_id", "belt_slug", "file_name", "uploaded_at", "created_at"],
+    },
+    "login_events": {
+        "key": ["id"],
+        "columns": ["id", "student_id", "action", "actor", "created_at"],
+    },
+}
+
+
+def _key_json(table: str, alias: str) -> str:
+    parts = ", ".join(f"'{column}', {alias}.{column}" for column in SYNC_TABLES[table]["key"])
+    return f"json_object({parts})"
+
+
+def _log_insert(table: str, alias: str, op: str) -> str:
+    return (
+        "INSERT INTO change_log (table_name, row_key, op, changed_at) "
+        f"VALUES ('{table}', {_key_json(table, alias)}, '{op}', strftime('%Y-%m-%dT%H:%M:%SZ', 'now'));"
+    )
+
+
+def _triggers_current(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f"cdc_{table}_insert",)
+    ).fetchone()
+    return bool(row) and _key_json(table, "NEW") in row[0]
+
+
+def _drop_triggers(conn: sqlite3.Connection, table: str) -> None:
+    """Drop triggers that log an outdated key, along with the unsynced entries they wrote."""
+    for op in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS cdc_{table}_{op}")
+    missing = " OR ".join(
+        f"json_type(row_key, '$.{column}') IS NULL" for column in SYNC_TABLES[table]["key"]
+    )
+    # Every current row is re-logged below; the sync tool's upserts are idempotent.
+    conn.execute(f"DELETE FROM change_log WHERE table_name = ? AND ({missing})", (table,))
+
+
+def ensure_change_capture(conn: sqlite3.Connection) -> bool:
+    """Create the change log and triggers. Returns True when capture was newly installed."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            target TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            synced_at TEXT
+        )
+        """
+    )
+
+    objects = {
+        (row[0], row[1])
+        for row in conn.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    }
+    installed = False
+    for table in SYNC_TABLES:
+        if ("table", table) not in objects:
+            continue
+        if ("trigger", f"cdc_{table}_insert") in objects:
+            if _triggers_current(conn, table):
+                continue
+            _drop_triggers(conn, table)
+        installed = True
+        conn.execute(
+            f"CREATE TRIGGER cdc_{table}_insert AFTER INSERT ON {table} "
+            f"BEGIN {_log_insert(table, 'NEW', 'upsert')} END"
+        )
+        # Log the old key too so a changed natural key deletes the stale D1 row.
+        conn.execute(
+            f"CREATE TRIGGER cdc_{table}_update AFTER UPDATE ON {table} "
+            f"BEGIN {_log_insert(table, 'OLD', 'upsert')} {_log_insert(table, 'NEW', 'upsert')} END"
+        )
+        conn.execute(
+            f"CREATE TRIGGER cdc_{table}_delete AFTER DELETE ON {table} "
+            f"BEGIN {_log_insert(table, 'OLD', 'delete')} END"
+        )
+        # Rows that predate the triggers still need to reach D1 once.
+        conn.execute(
+            "INSERT INTO change_log (table_name, row_key, op, changed_at) "
+            f"SELECT '{table}', {_key_json(table, 't')}, 'upsert', strftime('%Y-%m-%dT%H:%M:%SZ', 'now') "
+            f"FROM {table} t"
+        )
+    conn.commit()
+    return installed
@@ -0,0 +1,222 @@
+"""
+Retrieval for ``/chat``: top-k study-material sections from the local FTS5 index.
+
+The chat prompt is grounded in the same ``search_index`` that backs
+``/portal/search`` (see ``portal_search``), so retrieval is one local SQLite
+query instead of an embedding round trip. Three things keep it predictable:
+
+* a hard time budget, enforced inside SQLite with a progress handler that
+  interrupts the query once the deadline passes (the chat then simply goes out
+  without context);
+* an LRU cache with a TTL keyed by the normalized question (lowercased
+  keywords, stopwords dropped, sorted), so rephrasings of the same question
+  share an entry;
+* a token budget for the context block, estimated at four characters per
+  token, with every section trimmed on a word boundary.
+
+``StageTimer`` records how long each stage of a chat request took.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUDGET_SECONDS = 0.15
+DEFAULT_TOP_K = 4
+DEFAULT_MAX_CONTEXT_TOKENS = 800
+MAX_CHUNK_TOKENS = 300
+MAX_QUERY_TERMS = 12
+CHARS_PER_TOKEN = 4
+CACHE_SIZE = 256
+CACHE_TTL_SECONDS = 600
+PROGRESS_STEPS = 1000
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    """
+    a about am an and any are as at be can could do does for from have how i if in is it
+    me my need of on or should so tell than that the their them then there these they this
+    to was we what when where which who why will with would you your
+    """.split()
+)
+
+
+class RetrievalTimeout(Exception):
+    """Raised when retrieval runs past its time budget."""
+
+
+def query_terms(text: Optional[str]) -> Tuple[str, ...]:
+    """Normalized cache key: distinct non-stopword terms, sorted."""
+    words = {word for word in _WORD.findall((text or "").lower()) if word not in STOPWORDS and len(word) > 1}
+    return tuple(sorted(words))[:MAX_QUERY_TERMS]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[: cut if cut > 0 else limit].rstrip(" ,;:") + " …"
+
+
+def fetch_sections(
+    conn: sqlite3.Connection,
+    terms: Tuple[str, ...],
+    top_k: int,
+    deadline: float,
+) -> List[Dict[str, Any]]:
+    """Best BM25 sections matching any term; raises RetrievalTimeout past ``deadline``."""
+    if not terms:
+        return []
+    match = " OR ".join(f'"{term}"' for term in terms)
+    conn.set_progress_handler(lambda: int(time.monotonic() > deadline), PROGRESS_STEPS)
+    try:
+        rows = conn.execute(
+            """
+            SELECT title, body, path, belt_slug, bm25(search_index, 4.0, 1.0) AS score
+            FROM search_index
+            WHERE search_index MATCH ?
+            ORDER BY score
+            LIMIT ?
+            """,
+            (match, top_k),
+        ).fetchall()
+    except sqlite3.OperationalError as error:
+        if "interrupted" in str(error):
+            raise RetrievalTimeout(str(error)) from error
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+    return [
+        {"title": row[0], "body": row[1], "url": row[2], "beltSlug": row[3], "score": round(-row[4], 4)}
+        for row in rows
+    ]
+
+
+def pack_context(sections: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """Trim sections in rank order until the context token budget is spent."""
+    packed = []
+    remaining = max_tokens
+    for section in sections:
+        header = f"[{len(packed) + 1}] {section['title']}\n"
+        allowance = min(MAX_CHUNK_TOKENS, remaining - estimate_tokens(header))
+        if allowance < 20:
+            break
+        text = trim_to_tokens(section["body"], allowance)
+        packed.append({**section, "body": text})
+        remaining -= estimate_tokens(header) + estimate_tokens(text)
+    return packed
+
+
+class ChatRetriever:
+    """Budgeted, cached top-k retrieval over the local materials index."""
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+        top_k: int = DEFAULT_TOP_K,
+        max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+        cache_size: int = CACHE_SIZE,
+        cache_ttl: float = CACHE_TTL_SECONDS,
+    ):
+        self.connect = connect
+        self.budget_seconds = budget_seconds
+        self.top_k = top_k
+        self.max_context_tokens = max_context_tokens
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[Tuple[str, ...], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "timeouts": 0, "errors": 0}
+
+    def cached(self, question: str) -> Optional[List[Dict[str, Any]]]:
+        """Cache lookup only; None on a miss. Safe to call from the event loop."""
+        key = query_terms(question)
+        if not key:
+            return []
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.cache_ttl:
+                self._cache.pop(key, None)
+                return None
+            self._cache.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def _store(self, key: Tuple[str, ...], context: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic(), context)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def retrieve(self, question: str) -> List[Dict[str, Any]]:
+        """Context sections for a question; [] when nothing matched or the budget ran out."""
+        deadline = time.monotonic() + self.budget_seconds
+        hit = self.cached(question)
+        if hit is not None:
+            return hit
+
+        key = query_terms(question)
+        with self._lock:
+            self._stats["misses"] += 1
+        try:
+            conn = self.connect()
+            try:
+                sections = fetch_sections(conn, key, self.top_k, deadline)
+            finally:
+                conn.close()
+        except RetrievalTimeout:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return []
+        except sqlite3.Error:
+            with self._lock:
+                self._stats["errors"] += 1
+            return []
+
+        context = pack_context(sections, self.max_context_tokens)
+        self._store(key, context)
+        return context
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "cached": len(self._cache)}
+
+
+def format_context(context: List[Dict[str, Any]]) -> str:
+    return "\n\n".join(
+        f"[{number}] {section['title']}\n{section['body']}" for number, section in enumerate(context, start=1)
+    )
+
+
+class StageTimer:
+    """Wall-clock milliseconds per named stage of one request."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={duration}" for name, duration in self.stages.items())
@@ -0,0 +1,222 @@
+"""
+Background upkeep for the portal SQLite databases.
+
+Tasks:
+
+* ``backup`` copies the live database with the sqlite3 online backup API in
+  small page steps, sleeping between steps so writers are only ever blocked
+  for one step. Old snapshots beyond ``keep`` are deleted.
+* ``optimize`` runs ``PRAGMA optimize`` (and a full ``ANALYZE`` the first time,
+  when there are no statistics yet) so query plans follow the data.
+* ``checkpoint`` and ``incremental_vacuum`` only run when the database looked
+  quiet since the previous tick (``PRAGMA data_version`` unchanged), so they
+  never compete with a burst of logins.
+
+Each task returns a report with its duration and what it did. The scheduler is
+driven either in-process (see ``start_background_maintenance``, which reports
+to the ``portal.maintenance`` logger via ``log_report``) or from
+``scripts/maintain_db.py``.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+BACKUP_PAGES_PER_STEP = 64
+BACKUP_SLEEP_SECONDS = 0.005
+VACUUM_PAGES_PER_TICK = 256
+
+logger = logging.getLogger("portal.maintenance")
+
+
+def _report(task: str, started: float, **details: Any) -> Dict[str, Any]:
+    return {"task": task, "durationMs": round((time.perf_counter() - started) * 1000, 2), **details}
+
+
+def backup(
+    conn: sqlite3.Connection,
+    backup_dir: Path,
+    name: str = "portal",
+    keep: int = 7,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    sleep: float = BACKUP_SLEEP_SECONDS,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    target = backup_dir / f"{name}-{stamp}.db"
+    partial = target.with_suffix(".db.partial")
+    progress = {"steps": 0, "pages": 0}
+
+    def on_step(status, remaining, total):
+        progress["steps"] += 1
+        progress["pages"] = total - remaining
+
+    dest = sqlite3.connect(partial)
+    try:
+        conn.backup(dest, pages=pages, progress=on_step, sleep=sleep)
+    finally:
+        dest.close()
+    partial.replace(target)
+
+    # Exact match: shards share the backup dir and "portal-north-*.db" would
+    # otherwise count as snapshots of "portal".
+    snapshot_name = re.compile(rf"^{re.escape(name)}-\d{{8}}T\d{{6}}Z\.db$")
+    snapshots = sorted(path for path in backup_dir.glob(f"{name}-*.db") if snapshot_name.match(path.name))
+    stale = snapshots[:-keep] if keep > 0 else []
+    for path in stale:
+        path.unlink()
+
+    return _report(
+        "backup",
+        started,
+        path=str(target),
+        pagesCopied=progress["pages"],
+        steps=progress["steps"],
+        bytes=target.stat().st_size,
+        removed=[path.name for path in stale],
+    )
+
+
+def optimize(conn: sqlite3.Connection) -> Dict[str, Any]:
+    started = time.perf_counter()
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone()
+    if not has_stats:
+        conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+    return _report("optimize", started, analyzed=not has_stats)
+
+
+def checkpoint(conn: sqlite3.Connection, mode: str = "PASSIVE") -> Dict[str, Any]:
+    started = time.perf_counter()
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if journal_mode.lower() != "wal":
+        return _report("checkpoint", started, skipped=f"journal_mode={journal_mode}")
+    busy, log_pages, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return _report("checkpoint", started, mode=mode, busy=bool(busy), walPages=log_pages, checkpointed=checkpointed)
+
+
+def incremental_vacuum(conn: sqlite3.Connection, pages: int = VACUUM_PAGES_PER_TICK) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return _report("incremental_vacuum", started, skipped="auto_vacuum is not INCREMENTAL")
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    conn.commit()
+    free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return _report("incremental_vacuum", started, pagesFreed=free_before - free_after, freePages=free_after)
+
+
+def enable_wal(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """One-off switch to auto_vacuum=INCREMENTAL; needs a full VACUUM, so run it off-hours."""
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+class MaintenanceScheduler:
+    """Runs the maintenance tasks for one database on fixed intervals."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        backup_dir: Optional[Path] = None,
+        backup_every: float = 6 * 3600,
+        optimize_every: float = 3600,
+        keep: int = 7,
+        report: Callable[[Dict[str, Any]], None] = print,
+    ):
+        self.db_path = Path(db_path)
+        self.backup_dir = backup_dir
+        self.backup_every = backup_every
+        self.optimize_every = optimize_every
+        self.keep = keep
+        self.report = report
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._last_run: Dict[str, float] = {}
+
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _due(self, task: str, every: float, now: float) -> bool:
+        last = self._last_run.get(task)
+        return every > 0 and (last is None or now - last >= every)
+
+    def is_quiet(self) -> bool:
+        """True when no other connection committed since the previous call."""
+        version = self.connection().execute("PRAGMA data_version").fetchone()[0]
+        quiet = self._data_version is not None and version == self._data_version
+        self._data_version = version
+        return quiet
+
+    def tick(self, force: bool = False) -> List[Dict[str, Any]]:
+        conn = self.connection()
+        now = time.monotonic()
+        reports = []
+        quiet = self.is_quiet()
+        name = self.db_path.stem
+
+        if self.backup_dir and (force or self._due("backup", self.backup_every, now)):
+            reports.append(backup(conn, self.backup_dir, name=name, keep=self.keep))
+            self._last_run["backup"] = now
+        if force or self._due("optimize", self.optimize_every, now):
+            reports.append(optimize(conn))
+            self._last_run["optimize"] = now
+        if force or quiet:
+            reports.append(checkpoint(conn, "TRUNCATE" if force else "PASSIVE"))
+            reports.append(incremental_vacuum(conn))
+        # Our own maintenance writes bump nothing for this connection, but keep the
+        # baseline fresh so the next tick compares against post-maintenance state.
+        self.is_quiet()
+
+        for entry in reports:
+            entry["database"] = str(self.db_path)
+            self.report(entry)
+        return reports
+
+
+def log_report(entry: Dict[str, Any]) -> None:
+    """Report sink for the in-process scheduler: failures at ERROR, the rest at INFO."""
+    if entry.get("task") == "error":
+        logger.error("maintenance failed: %s", entry)
+    else:
+        logger.info("maintenance: %s", entry)
+
+
+def start_background_maintenance(
+    schedulers: Iterable[MaintenanceScheduler],
+    interval: float,
+) -> threading.Event:
+    """Tick every scheduler on a daemon thread; set the returned event to stop."""
+    stop = threading.Event()
+    schedulers = list(schedulers)
+
+    def loop():
+        while not stop.wait(interval):
+            for scheduler in schedulers:
+                try:
+                    scheduler.tick()
+                except Exception as error:  # keep maintaining the other shards
+                    scheduler.report({"task": "error", "database": str(scheduler.db_path), "error": str(error)})
+
+    threading.Thread(target=loop, name="portal-db-maintenance", daemon=True).start()
+    return stop
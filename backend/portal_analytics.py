@@ -0,0 +1,368 @@
+"""
+Time-bucketed activity analytics for the admin dashboard.
+
+Triggers on ``login_events`` and ``belt_progress`` keep small rollup tables up
+to date at write time, so dashboard queries read a handful of pre-aggregated
+rows per bucket instead of scanning the raw event tables:
+
+* ``activity_rollup`` holds counters per (bucket, bucket_start, metric,
+  dimension) for ``logins``, ``events``, ``uploads`` (by belt slug) and
+  ``active_students`` (by belt name).
+* ``activity_students`` records each student once per bucket with their belt
+  at the time; its insert trigger bumps ``active_students`` the first time a
+  student shows up in a bucket, which keeps the distinct count incremental.
+  Deleting a student's last event in a bucket removes the row again, and its
+  delete trigger takes the student back off the counter.
+
+``backfill_rollups`` rebuilds both tables from the raw data. Across shards the
+per-shard counters cannot simply be added (one student can have history in
+two locations), so ``merge_analytics`` recounts active students from
+``active_student_rows``.
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from portal_assets import belt_slug
+
+BUCKETS = ("hour", "day", "week", "month")
+SERIES_NAMES = {"logins": "logins", "events": "events", "uploads": "uploads", "active_students": "activeStudents"}
+DEFAULT_LOOKBACK = {
+    "hour": timedelta(days=2),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=26),
+    "month": timedelta(days=365),
+}
+
+_BUCKET_LIST = ", ".join(f"('{bucket}')" for bucket in BUCKETS)
+
+
+def bucket_start_sql(bucket_expr: str, timestamp_expr: str) -> str:
+    """SQL expression for the start of the bucket containing a timestamp (weeks start Monday)."""
+    return (
+        f"CASE {bucket_expr}"
+        f" WHEN 'hour' THEN strftime('%Y-%m-%dT%H:00:00Z', {timestamp_expr})"
+        f" WHEN 'day' THEN date({timestamp_expr})"
+        f" WHEN 'week' THEN date({timestamp_expr}, 'weekday 0', '-6 days')"
+        f" WHEN 'month' THEN strftime('%Y-%m-01', {timestamp_expr})"
+        " END"
+    )
+
+
+def _counter_upsert(
+    metric: str,
+    timestamp_expr: str,
+    dimension_expr: str,
+    delta: int,
+    condition: str = "1",
+) -> str:
+    return f"""
+        INSERT INTO activity_rollup (bucket, metric, bucket_start, dimension, value)
+        SELECT bucket, '{metric}', bucket_start, {dimension_expr}, {delta}
+        FROM (
+            SELECT column1 AS bucket, {bucket_start_sql('column1', timestamp_expr)} AS bucket_start
+            FROM (VALUES {_BUCKET_LIST})
+        )
+        WHERE bucket_start IS NOT NULL AND {condition}
+        ON CONFLICT(bucket, bucket_start, metric, dimension) DO UPDATE SET value = value + excluded.value;
+    """
+
+
+def _active_student_insert(alias: str) -> str:
+    return f"""
+        INSERT OR IGNORE INTO activity_students (bucket, bucket_start, student_id, belt_name)
+        SELECT bucket, bucket_start, {alias}.student_id,
+            (SELECT current_belt FROM students WHERE LOWER(id) = LOWER({alias}.student_id) LIMIT 1)
+        FROM (
+            SELECT column1 AS bucket, {bucket_start_sql('column1', f'{alias}.created_at')} AS bucket_start
+            FROM (VALUES {_BUCKET_LIST})
+        )
+        WHERE bucket_start IS NOT NULL;
+    """
+
+
+def _active_student_delete(alias: str) -> str:
+    """Drop the student from buckets where ``alias`` was their last remaining event."""
+    return f"""
+        DELETE FROM activity_students
+        WHERE student_id = {alias}.student_id
+            AND (bucket, bucket_start) IN (
+                SELECT column1, {bucket_start_sql('column1', f'{alias}.created_at')}
+                FROM (VALUES {_BUCKET_LIST})
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM login_events e
+                WHERE e.student_id = {alias}.student_id
+                    AND {bucket_start_sql('activity_students.bucket', 'e.created_at')} = activity_students.bucket_start
+            );
+    """
+
+
+def _login_counters(alias: str, delta: int) -> str:
+    return _counter_upsert("events", f"{alias}.created_at", "''", delta) + _counter_upsert(
+        "logins", f"{alias}.created_at", "''", delta, condition=f"{alias}.action = 'login'"
+    )
+
+
+def ensure_analytics(conn: sqlite3.Connection) -> bool:
+    """Create rollup tables and triggers; backfill on first install. Returns True if installed."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS activity_rollup (
+            bucket TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            dimension TEXT NOT NULL DEFAULT '',
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, bucket_start, metric, dimension)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS activity_students (
+            bucket TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            student_id TEXT NOT NULL,
+            belt_name TEXT,
+            PRIMARY KEY (bucket, bucket_start, student_id)
+        ) WITHOUT ROWID
+        """
+    )
+
+    # Used by the delete trigger to find a student's other events in a bucket.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_events_student_created ON login_events(student_id, created_at)"
+    )
+
+    existing = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'rollup_%'")
+    }
+    if "rollup_activity_students_delete" in existing:
+        return False
+    # Older installs lack the active-student cleanup on delete; rebuild all triggers.
+    for name in existing:
+        conn.execute(f"DROP TRIGGER {name}")
+
+    conn.execute(
+        "CREATE TRIGGER rollup_login_events_insert AFTER INSERT ON login_events BEGIN"
+        f" {_login_counters('NEW', 1)} {_active_student_insert('NEW')} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER rollup_login_events_delete AFTER DELETE ON login_events BEGIN"
+        f" {_login_counters('OLD', -1)} {_active_student_delete('OLD')} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER rollup_belt_progress_insert AFTER INSERT ON belt_progress BEGIN"
+        f" {_counter_upsert('uploads', 'NEW.uploaded_at', 'NEW.belt_slug', 1)} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER rollup_belt_progress_update AFTER UPDATE OF belt_slug, uploaded_at ON belt_progress BEGIN"
+        f" {_counter_upsert('uploads', 'OLD.uploaded_at', 'OLD.belt_slug', -1)}"
+        f" {_counter_upsert('uploads', 'NEW.uploaded_at', 'NEW.belt_slug', 1)} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER rollup_belt_progress_delete AFTER DELETE ON belt_progress BEGIN"
+        f" {_counter_upsert('uploads', 'OLD.uploaded_at', 'OLD.belt_slug', -1)} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER rollup_activity_students_insert AFTER INSERT ON activity_students BEGIN"
+        " INSERT INTO activity_rollup (bucket, metric, bucket_start, dimension, value)"
+        " VALUES (NEW.bucket, 'active_students', NEW.bucket_start, COALESCE(NEW.belt_name, ''), 1)"
+        " ON CONFLICT(bucket, bucket_start, metric, dimension) DO UPDATE SET value = value + 1; END"
+    )
+    conn.execute(
+        "CREATE TRIGGER rollup_activity_students_delete AFTER DELETE ON activity_students BEGIN"
+        " UPDATE activity_rollup SET value = value - 1"
+        " WHERE bucket = OLD.bucket AND bucket_start = OLD.bucket_start"
+        " AND metric = 'active_students' AND dimension = COALESCE(OLD.belt_name, ''); END"
+    )
+    backfill_rollups(conn)
+    return True
+
+
+def backfill_rollups(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Rebuild the rollup tables from login_events and belt_progress in one transaction."""
+    conn.execute("DELETE FROM activity_students")
+    conn.execute("DELETE FROM activity_rollup")
+
+    buckets = f"(SELECT column1 AS bucket FROM (VALUES {_BUCKET_LIST})) b"
+    for metric, source, timestamp, dimension, where in (
+        ("events", "login_events", "created_at", "''", "1"),
+        ("logins", "login_events", "created_at", "''", "t.action = 'login'"),
+        ("uploads", "belt_progress", "uploaded_at", "t.belt_slug", "1"),
+    ):
+        conn.execute(
+            f"""
+            INSERT INTO activity_rollup (bucket, metric, bucket_start, dimension, value)
+            SELECT b.bucket, '{metric}', {bucket_start_sql('b.bucket', f't.{timestamp}')} AS bucket_start,
+                {dimension} AS dimension, COUNT(*)
+            FROM {source} t, {buckets}
+            WHERE {where} AND bucket_start IS NOT NULL
+            GROUP BY b.bucket, bucket_start, dimension
+            """
+        )
+    conn.execute(
+        f"""
+        INSERT OR IGNORE INTO activity_students (bucket, bucket_start, student_id, belt_name)
+        SELECT b.bucket, {bucket_start_sql('b.bucket', 't.created_at')} AS bucket_start, t.student_id,
+            (SELECT current_belt FROM students WHERE LOWER(id) = LOWER(t.student_id) LIMIT 1)
+        FROM login_events t, {buckets}
+        WHERE bucket_start IS NOT NULL
+        """
+    )
+    # The activity_students insert trigger already counted active students; rebuild the
+    # counters in bulk in case the rows were inserted while the trigger was missing.
+    conn.execute("DELETE FROM activity_rollup WHERE metric = 'active_students'")
+    conn.execute(
+        """
+        INSERT INTO activity_rollup (bucket, metric, bucket_start, dimension, value)
+        SELECT bucket, 'active_students', bucket_start, COALESCE(belt_name, ''), COUNT(*)
+        FROM activity_students
+        GROUP BY bucket, bucket_start, COALESCE(belt_name, '')
+        """
+    )
+    conn.commit()
+    return rollup_stats(conn)
+
+
+def rollup_stats(conn: sqlite3.Connection) -> Dict[str, int]:
+    return {
+        "rollupRows": conn.execute("SELECT COUNT(*) FROM activity_rollup").fetchone()[0],
+        "activeStudentRows": conn.execute("SELECT COUNT(*) FROM activity_students").fetchone()[0],
+    }
+
+
+def _parse_bound(value: Optional[str], fallback: datetime, end_of_day: bool = False) -> datetime:
+    if not value:
+        return fallback
+    text = value.strip().replace("Z", "+00:00")
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None) - (parsed.utcoffset() or timedelta(0))
+    if end_of_day and len(text) == 10:
+        # A bare date as the upper bound includes the whole day.
+        parsed += timedelta(days=1, seconds=-1)
+    return parsed
+
+
+def query_analytics(
+    conn: sqlite3.Connection,
+    bucket: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Read the rollups for ``bucket`` between two ISO dates/timestamps (inclusive)."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    end_at = _parse_bound(end, datetime.utcnow(), end_of_day=True)
+    start_at = _parse_bound(start, end_at - DEFAULT_LOOKBACK[bucket])
+    if start_at > end_at:
+        raise ValueError("from must be before to")
+
+    start_iso = start_at.isoformat(timespec="seconds") + "Z"
+    end_iso = end_at.isoformat(timespec="seconds") + "Z"
+    first, last = conn.execute(
+        f"SELECT {bucket_start_sql('?1', '?2')}, {bucket_start_sql('?1', '?3')}",
+        (bucket, start_iso, end_iso),
+    ).fetchone()
+
+    rows = conn.execute(
+        """
+        SELECT metric, bucket_start, dimension, value
+        FROM activity_rollup
+        WHERE bucket = ? AND bucket_start BETWEEN ? AND ? AND value != 0
+        ORDER BY bucket_start, metric, dimension
+        """,
+        (bucket, first, last),
+    ).fetchall()
+
+    series: Dict[str, List[Dict[str, Any]]] = {name: [] for name in SERIES_NAMES.values()}
+    active: Dict[tuple, int] = {}
+    for metric, bucket_start, dimension, value in rows:
+        if metric == "active_students":
+            # Belt names are free text on the roster; merge them by slug.
+            key = (bucket_start, belt_slug(dimension) or "unknown")
+            active[key] = active.get(key, 0) + value
+            continue
+        if metric not in SERIES_NAMES:
+            continue
+        point: Dict[str, Any] = {"bucketStart": bucket_start, "value": value}
+        if metric == "uploads":
+            point["beltSlug"] = dimension
+        series[SERIES_NAMES[metric]].append(point)
+    series["activeStudents"] = [
+        {"bucketStart": bucket_start, "beltSlug": slug, "value": value}
+        for (bucket_start, slug), value in sorted(active.items())
+    ]
+
+    return {"bucket": bucket, "from": first, "to": last, "series": series}
+
+
+def active_student_rows(
+    conn: sqlite3.Connection,
+    bucket: str,
+    first: str,
+    last: str,
+) -> List[Tuple[str, str, str]]:
+    """(bucket_start, student_id, belt_slug) per active student, for cross-shard dedupe."""
+    return [
+        (bucket_start, student_id.lower(), belt_slug(belt_name) or "unknown")
+        for bucket_start, student_id, belt_name in conn.execute(
+            """
+            SELECT bucket_start, student_id, belt_name
+            FROM activity_students
+            WHERE bucket = ? AND bucket_start BETWEEN ? AND ?
+            """,
+            (bucket, first, last),
+        )
+    ]
+
+
+def merge_analytics(
+    results: Iterable[Dict[str, Any]],
+    active_rows: Optional[Iterable[Tuple[str, str, str]]] = None,
+) -> Dict[str, Any]:
+    """Sum per-shard analytics results point by point (same bucket and range).
+
+    When ``active_rows`` (from ``active_student_rows`` on every shard) is given,
+    active students are recounted from it so each student counts once per bucket.
+    """
+    merged: Optional[Dict[str, Any]] = None
+    totals: Dict[str, Dict[tuple, int]] = {}
+    for result in results:
+        if merged is None:
+            merged = {key: value for key, value in result.items() if key != "series"}
+        for name, points in result["series"].items():
+            series = totals.setdefault(name, {})
+            for point in points:
+                key = (point["bucketStart"], point.get("beltSlug"))
+                series[key] = series.get(key, 0) + point["value"]
+
+    if merged is None:
+        return {"series": {name: [] for name in SERIES_NAMES.values()}}
+    merged["series"] = {name: [] for name in SERIES_NAMES.values()}
+    for name, series in totals.items():
+        points = []
+        for (bucket_start, slug), value in sorted(series.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+            point: Dict[str, Any] = {"bucketStart": bucket_start, "value": value}
+            if slug is not None:
+                point["beltSlug"] = slug
+            points.append(point)
+        merged["series"][name] = points
+
+    if active_rows is not None:
+        # First shard wins the belt for a student seen in several shards.
+        students: Dict[tuple, str] = {}
+        for bucket_start, student_id, slug in active_rows:
+            students.setdefault((bucket_start, student_id), slug)
+        counts: Dict[tuple, int] = {}
+        for (bucket_start, _), slug in students.items():
+            counts[(bucket_start, slug)] = counts.get((bucket_start, slug), 0) + 1
+        merged["series"]["activeStudents"] = [
+            {"bucketStart": bucket_start, "beltSlug": slug, "value": value}
+            for (bucket_start, slug), value in sorted(counts.items())
+        ]
+    return merged
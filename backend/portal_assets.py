@@ -0,0 +1,172 @@
+"""
+Helpers for the static portal content that lives under ``assets/``.
+
+The student portal needs the rotating week theme and the study materials for a
+student's belt. Both are read from disk once and cached against the file mtime,
+so repeated portal requests never re-parse unchanged files. When
+``scripts/build_asset_manifest.py`` has been run, each material also carries a
+``versionedUrl`` pointing at its content-hashed copy under ``assets/hashed/``.
+"""
+
+import json
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ASSETS_DIR = Path(
+    os.getenv("PORTAL_ASSETS_DIR", Path(__file__).resolve().parent.parent / "assets")
+)
+MATERIALS_DIR = ASSETS_DIR / "materials"
+BELT_IMAGES_DIR = ASSETS_DIR / "Images" / "belts"
+WEEK_THEME_PATH = ASSETS_DIR / "data" / "week-theme.json"
+CURRICULUM_PDF_NAME = "tkd-curriculum-aras-martial-arts.pdf"
+MANIFEST_PATH = ASSETS_DIR / "data" / "asset-manifest.json"
+HASHED_DIR = ASSETS_DIR / "hashed"
+
+_week_theme_cache: Dict[str, Any] = {"mtime": None, "data": None}
+_materials_cache: Dict[str, Any] = {"mtime": None, "files": []}
+_manifest_cache: Dict[str, Any] = {"mtime": None, "data": None}
+
+_BELT_FILE = re.compile(
+    r"^(?:tkd-curriculum-)?(?P<slug>[a-z0-9-]+?)-belt(?:-study-guide|-testing-checklist)?\.[a-z0-9]+$"
+)
+
+
+def belt_slug(belt_name: Optional[str]) -> Optional[str]:
+    """Turn a belt name such as "High White Belt" into the portal slug "high-white"."""
+    if not belt_name:
+        return None
+    words = re.findall(r"[a-z0-9]+", belt_name.lower())
+    words = [word for word in words if word != "belt"]
+    return "-".join(words) or None
+
+
+def asset_url(path: Path) -> str:
+    return "assets/" + path.relative_to(ASSETS_DIR).as_posix()
+
+
+def _load_week_theme_file() -> Optional[Dict[str, Any]]:
+    try:
+        mtime = WEEK_THEME_PATH.stat().st_mtime
+    except OSError:
+        return None
+    if _week_theme_cache["mtime"] != mtime:
+        with WEEK_THEME_PATH.open("r", encoding="utf-8") as handle:
+            _week_theme_cache["data"] = json.load(handle)
+        _week_theme_cache["mtime"] = mtime
+    return _week_theme_cache["data"]
+
+
+def current_week_theme(today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """Resolve the active theme the same way the kiosk does (rotation first, then override)."""
+    try:
+        data = _load_week_theme_file()
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    today = today or date.today()
+    rotation = data.get("rotation") or {}
+    themes = [
+        {"key": t.get("key") or "", "label": t.get("label") or "", "message": t.get("message") or ""}
+        for t in rotation.get("themes") or []
+        if isinstance(t, dict) and (t.get("label") or t.get("message"))
+    ]
+    try:
+        start = date.fromisoformat(rotation.get("start") or "")
+    except ValueError:
+        start = None
+
+    if start and themes:
+        try:
+            weeks = int(rotation.get("weeks") or 2)
+        except (TypeError, ValueError):
+            weeks = 2
+        diff_days = (today - start).days
+        index = 0 if diff_days < 0 else (diff_days // (max(weeks, 1) * 7)) % len(themes)
+        return themes[index]
+
+    if data.get("label") or data.get("message"):
+        return {"key": "", "label": data.get("label") or "", "message": data.get("message") or ""}
+    return None
+
+
+def _material_files() -> List[Path]:
+    try:
+        mtime = MATERIALS_DIR.stat().st_mtime
+    except OSError:
+        return []
+    if _materials_cache["mtime"] != mtime:
+        _materials_cache["files"] = sorted(p for p in MATERIALS_DIR.iterdir() if p.is_file())
+        _materials_cache["mtime"] = mtime
+    return _materials_cache["files"]
+
+
+def _material_kind(name: str) -> str:
+    if name.endswith("-study-guide.md"):
+        return "studyGuide"
+    if name.endswith("-testing-checklist.md"):
+        return "testingChecklist"
+    if name.startswith("tkd-curriculum-"):
+        return "curriculum"
+    return "other"
+
+
+def describe_asset(path: Path) -> Dict[str, Optional[str]]:
+    """Classify a material or belt image as {kind, beltSlug} from its file name."""
+    name = path.name
+    if path.parent == BELT_IMAGES_DIR:
+        kind = "beltImage"
+    elif name == CURRICULUM_PDF_NAME:
+        kind = "curriculumPdf"
+    else:
+        kind = _material_kind(name)
+    match = _BELT_FILE.match(name)
+    return {"kind": kind, "beltSlug": match.group("slug") if match else None}
+
+
+def load_asset_manifest() -> Optional[Dict[str, Any]]:
+    """The manifest written by scripts/build_asset_manifest.py, or None if it was never built."""
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
+    if _manifest_cache["mtime"] != mtime:
+        try:
+            with MANIFEST_PATH.open("r", encoding="utf-8") as handle:
+                _manifest_cache["data"] = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["data"]
+
+
+def _material_entry(path: Path, kind: str, manifest: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    entry = {"name": path.name, "kind": kind, "url": asset_url(path)}
+    hashed = (manifest or {}).get("assets", {}).get(path.relative_to(ASSETS_DIR).as_posix())
+    if hashed:
+        entry["versionedUrl"] = hashed["url"]
+    return entry
+
+
+def belt_materials(slug: Optional[str]) -> List[Dict[str, Any]]:
+    """List the study materials for a belt slug, plus the shared curriculum PDF."""
+    materials: List[Dict[str, Any]] = []
+    manifest = load_asset_manifest()
+    if slug:
+        stem = f"{slug}-belt"
+        for path in _material_files():
+            name = path.name
+            if name.startswith(f"{stem}-") or name.startswith(f"tkd-curriculum-{stem}."):
+                materials.append(_material_entry(path, _material_kind(name), manifest))
+        image = BELT_IMAGES_DIR / f"{stem}.svg"
+        if image.exists():
+            materials.append(_material_entry(image, "beltImage", manifest))
+
+    pdf = MATERIALS_DIR / CURRICULUM_PDF_NAME
+    if pdf.exists():
+        materials.append(_material_entry(pdf, "curriculumPdf", manifest))
+    return materials
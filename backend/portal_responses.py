@@ -0,0 +1,90 @@
+"""
+JSON response helpers for hot portal endpoints.
+
+Uses orjson when it is installed (falling back to the standard library) and
+compresses the body with brotli or gzip depending on the client's
+Accept-Encoding header. Small bodies are sent as-is since compressing them
+costs more than it saves.
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional speedup
+    brotli = None
+
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _accepted_encodings(header: Optional[str]) -> dict:
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str]) -> Optional[str]:
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = []
+    if brotli is not None:
+        candidates.append("br")
+    candidates.append("gzip")
+    best = None
+    best_quality = 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    body = dumps(payload)
+    encoding = None
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+        body = compress(body, encoding)
+
+    response = Response(body, status=status, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,296 @@
+"""
+Local full-text search over the study guides, testing checklists and the
+curriculum PDF, backed by an SQLite FTS5 table inside the portal database.
+
+Documents are split into sections (markdown headings, PDF pages) so BM25 ranks
+and highlights the relevant part of a guide instead of the whole file. Sources
+are tracked by mtime, size and content hash, so a refresh only re-indexes files
+that actually changed.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from portal_assets import CURRICULUM_PDF_NAME, MATERIALS_DIR, asset_url, belt_slug
+
+REFRESH_INTERVAL_SECONDS = 30
+MAX_RESULTS = 50
+SNIPPET_TOKENS = 16
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+_MATERIAL_NAME = re.compile(r"^(?P<slug>.+)-belt-(?P<kind>study-guide|testing-checklist)\.md$")
+_PDF_PAGE_BELT = re.compile(r"^\s*((?:high\s+)?[a-z]+)\s+belt\b", re.IGNORECASE)
+_QUERY_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+_last_refresh = {"at": 0.0}
+
+
+def ensure_search_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS search_sources (
+            path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            indexed_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            title,
+            body,
+            path UNINDEXED,
+            belt_slug UNINDEXED,
+            kind UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """
+    )
+
+
+def _split_markdown(text: str, fallback_title: str) -> List[Tuple[str, str]]:
+    sections: List[Tuple[str, str]] = []
+    doc_title = fallback_title
+    title = fallback_title
+    lines: List[str] = []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append((title, body))
+
+    for line in text.splitlines():
+        heading = re.match(r"^(#{1,6})\s+(.*)$", line)
+        if heading:
+            flush()
+            lines = []
+            if heading.group(1) == "#":
+                doc_title = heading.group(2).strip()
+                title = doc_title
+            else:
+                title = f"{doc_title} - {heading.group(2).strip()}"
+            continue
+        lines.append(line)
+    flush()
+    return sections
+
+
+def _read_pdf_pages(path: Path) -> Optional[List[str]]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    reader = PdfReader(str(path))
+    return [re.sub(r"\s+", " ", page.extract_text() or "").strip() for page in reader.pages]
+
+
+def _documents_for(path: Path, data: bytes) -> Optional[List[Dict[str, Any]]]:
+    """Split a source file into indexable rows, or None if it cannot be read here."""
+    if path.suffix.lower() == ".md":
+        match = _MATERIAL_NAME.match(path.name)
+        slug = match.group("slug") if match else None
+        kind = match.group("kind").replace("-", "_") if match else "guide"
+        text = data.decode("utf-8-sig", errors="replace")
+        return [
+            {"title": title, "body": body, "belt_slug": slug, "kind": kind}
+            for title, body in _split_markdown(text, path.stem.replace("-", " ").title())
+        ]
+
+    pages = _read_pdf_pages(path)
+    if pages is None:
+        return None
+    documents = []
+    for number, text in enumerate(pages, start=1):
+        if not text:
+            continue
+        belt_match = _PDF_PAGE_BELT.match(text)
+        documents.append(
+            {
+                "title": f"Curriculum page {number}",
+                "body": text,
+                "belt_slug": belt_slug(belt_match.group(1)) if belt_match else None,
+                "kind": "curriculum",
+            }
+        )
+    return documents
+
+
+def search_source_paths(materials_dir: Path = MATERIALS_DIR) -> List[Path]:
+    if not materials_dir.exists():
+        return []
+    paths = sorted(materials_dir.glob("*.md"))
+    pdf = materials_dir / CURRICULUM_PDF_NAME
+    if pdf.exists():
+        paths.append(pdf)
+    return paths
+
+
+def refresh_search_index(conn: sqlite3.Connection, paths: Optional[Iterable[Path]] = None) -> Dict[str, int]:
+    """Re-index sources whose mtime/size changed and drop sources that disappeared.
+
+    Every changed source is read and parsed before the first write, so the write
+    lock on the portal database is only held for the inserts themselves, not
+    while the curriculum PDF is being parsed.
+    """
+    ensure_search_schema(conn)
+    paths = list(search_source_paths() if paths is None else paths)
+    known = {
+        row[0]: (row[1], row[2], row[3])
+        for row in conn.execute("SELECT path, mtime, size, content_hash FROM search_sources")
+    }
+    stats = {"indexed": 0, "unchanged": 0, "removed": 0, "skipped": 0}
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    seen = set()
+    touched = []
+    reindexed = []
+    for path in paths:
+        key = asset_url(path)
+        seen.add(key)
+        try:
+            info = path.stat()
+        except OSError:
+            continue
+        previous = known.get(key)
+        if previous and previous[0] == info.st_mtime and previous[1] == info.st_size:
+            stats["unchanged"] += 1
+            continue
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if previous and previous[2] == digest:
+            touched.append((info.st_mtime, info.st_size, key))
+            stats["unchanged"] += 1
+            continue
+
+        documents = _documents_for(path, data)
+        if documents is None:
+            stats["skipped"] += 1
+            continue
+        reindexed.append((key, info, digest, documents))
+
+    conn.executemany("UPDATE search_sources SET mtime = ?, size = ? WHERE path = ?", touched)
+    for key, info, digest, documents in reindexed:
+        conn.execute("DELETE FROM search_index WHERE path = ?", (key,))
+        conn.executemany(
+            "INSERT INTO search_index (title, body, path, belt_slug, kind) VALUES (?, ?, ?, ?, ?)",
+            [(doc["title"], doc["body"], key, doc["belt_slug"], doc["kind"]) for doc in documents],
+        )
+        conn.execute(
+            """
+            INSERT INTO search_sources (path, mtime, size, content_hash, indexed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                mtime = excluded.mtime,
+                size = excluded.size,
+                content_hash = excluded.content_hash,
+                indexed_at = excluded.indexed_at
+            """,
+            (key, info.st_mtime, info.st_size, digest, now),
+        )
+        stats["indexed"] += 1
+
+    for key in set(known) - seen:
+        conn.execute("DELETE FROM search_index WHERE path = ?", (key,))
+        conn.execute("DELETE FROM search_sources WHERE path = ?", (key,))
+        stats["removed"] += 1
+
+    conn.commit()
+    _last_refresh["at"] = time.monotonic()
+    return stats
+
+
+def maybe_refresh_search_index(conn: sqlite3.Connection) -> Optional[Dict[str, int]]:
+    """Cheap periodic refresh so edits to the materials show up without a restart."""
+    if time.monotonic() - _last_refresh["at"] >= REFRESH_INTERVAL_SECONDS:
+        return refresh_search_index(conn)
+    return None
+
+
+def index_changed(stats: Optional[Dict[str, int]]) -> bool:
+    return bool(stats) and (stats["indexed"] > 0 or stats["removed"] > 0)
+
+
+def start_background_refresh(
+    connect: Callable[[], sqlite3.Connection],
+    on_change: Callable[[], None],
+    interval: float = REFRESH_INTERVAL_SECONDS,
+) -> threading.Event:
+    """Refresh the index on a daemon thread so request paths never pay for re-indexing."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            conn = connect()
+            try:
+                if index_changed(maybe_refresh_search_index(conn)):
+                    on_change()
+            except sqlite3.Error:
+                pass  # try again next tick
+            finally:
+                conn.close()
+
+    threading.Thread(target=loop, name="portal-search-refresh", daemon=True).start()
+    return stop
+
+
+def build_match_query(raw_query: Optional[str]) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: quoted terms, prefix match on the last one."""
+    tokens = _QUERY_TOKEN.findall((raw_query or "").lower())
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens[:-1]]
+    terms.append(f'"{tokens[-1]}"*')
+    return " ".join(terms)
+
+
+def search_materials(
+    conn: sqlite3.Connection,
+    query: str,
+    belt: Optional[str] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    match = build_match_query(query)
+    if not match:
+        return []
+    limit = max(1, min(MAX_RESULTS, limit))
+
+    sql = """
+        SELECT
+            title,
+            path,
+            belt_slug,
+            kind,
+            snippet(search_index, 1, ?, ?, '…', ?) AS snippet,
+            bm25(search_index, 4.0, 1.0) AS score
+        FROM search_index
+        WHERE search_index MATCH ?
+    """
+    params: List[Any] = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, SNIPPET_TOKENS, match]
+    if belt:
+        sql += " AND belt_slug = ?"
+        params.append(belt)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    rows = conn.execute(sql, params).fetchall()
+    return [
+        {
+            "title": row[0],
+            "url": row[1],
+            "beltSlug": row[2],
+            "kind": row[3],
+            "snippet": row[4],
+            "score": round(-row[5], 4),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,153 @@
+"""
+Rotating refresh tokens for portal sessions.
+
+A refresh token is ``<family_id>.<secret>``. Each login starts a new family (one
+row in ``portal_refresh_tokens``) that only stores a 16-byte hash of the
+current secret. Refreshing swaps in a new secret with a single conditional
+UPDATE, so renewing a session never touches ``students``, ``belt_progress`` or
+``login_events``.
+
+Presenting a secret that was already rotated out means the token leaked or was
+replayed; the whole family is revoked and the student has to log in again.
+
+Every login adds a family, so dead families are pruned every
+``PRUNE_EVERY_ISSUES`` issues (and at startup).
+"""
+
+import hashlib
+import hmac
+import itertools
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+SECRET_BYTES = 32
+PRUNE_EVERY_ISSUES = 200
+
+_issued = itertools.count(1)
+_issued_lock = threading.Lock()
+
+
+class RefreshTokenError(Exception):
+    """Raised when a refresh token is malformed, expired, revoked or reused."""
+
+    def __init__(self, message: str, reused: bool = False):
+        super().__init__(message)
+        self.reused = reused
+
+
+def ensure_session_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS portal_refresh_tokens (
+            family_id TEXT PRIMARY KEY,
+            student_id TEXT NOT NULL,
+            token_hash BLOB NOT NULL,
+            expires_at INTEGER NOT NULL,
+            absolute_expires_at INTEGER NOT NULL,
+            revoked INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _hash_secret(secret: str) -> bytes:
+    return hashlib.sha256(secret.encode("utf-8")).digest()[:16]
+
+
+def _split(token: Optional[str]) -> Tuple[str, str]:
+    family_id, sep, secret = (token or "").strip().partition(".")
+    if not sep or not family_id or not secret:
+        raise RefreshTokenError("Invalid refresh token")
+    return family_id, secret
+
+
+def issue_refresh_token(
+    conn: sqlite3.Connection,
+    student_id: str,
+    ttl_seconds: int,
+    max_age_seconds: int,
+) -> str:
+    """Start a new token family for a fresh login."""
+    now = int(time.time())
+    family_id = secrets.token_urlsafe(12)
+    secret = secrets.token_urlsafe(SECRET_BYTES)
+    conn.execute(
+        """
+        INSERT INTO portal_refresh_tokens (family_id, student_id, token_hash, expires_at, absolute_expires_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (family_id, student_id, _hash_secret(secret), now + ttl_seconds, now + max_age_seconds),
+    )
+    conn.commit()
+    with _issued_lock:
+        due = next(_issued) % PRUNE_EVERY_ISSUES == 0
+    if due:
+        prune_refresh_tokens(conn)
+    return f"{family_id}.{secret}"
+
+
+def rotate_refresh_token(conn: sqlite3.Connection, token: str, ttl_seconds: int) -> Tuple[str, str]:
+    """Exchange a refresh token for a new one. Returns (student_id, new_token)."""
+    family_id, secret = _split(token)
+    now = int(time.time())
+    new_secret = secrets.token_urlsafe(SECRET_BYTES)
+
+    row = conn.execute(
+        """
+        UPDATE portal_refresh_tokens
+        SET token_hash = ?, expires_at = MIN(? + ?, absolute_expires_at)
+        WHERE family_id = ? AND token_hash = ? AND revoked = 0 AND expires_at > ?
+        RETURNING student_id
+        """,
+        (_hash_secret(new_secret), now, ttl_seconds, family_id, _hash_secret(secret), now),
+    ).fetchone()
+    if row:
+        conn.commit()
+        return row[0], f"{family_id}.{new_secret}"
+
+    # Slow path: work out why the swap failed.
+    current = conn.execute(
+        "SELECT token_hash, revoked FROM portal_refresh_tokens WHERE family_id = ?",
+        (family_id,),
+    ).fetchone()
+    conn.commit()
+    if current is None:
+        raise RefreshTokenError("Invalid refresh token")
+    token_hash, revoked = current
+    if revoked:
+        raise RefreshTokenError("Refresh token revoked")
+    if not hmac.compare_digest(bytes(token_hash), _hash_secret(secret)):
+        revoke_family(conn, family_id)
+        raise RefreshTokenError("Refresh token reuse detected", reused=True)
+    raise RefreshTokenError("Refresh token expired")
+
+
+def revoke_family(conn: sqlite3.Connection, family_id: str) -> None:
+    conn.execute("UPDATE portal_refresh_tokens SET revoked = 1 WHERE family_id = ?", (family_id,))
+    conn.commit()
+
+
+def revoke_refresh_token(conn: sqlite3.Connection, token: str) -> None:
+    """Log out: revoke the family, but only for its current token."""
+    family_id, secret = _split(token)
+    cursor = conn.execute(
+        "UPDATE portal_refresh_tokens SET revoked = 1 WHERE family_id = ? AND token_hash = ?",
+        (family_id, _hash_secret(secret)),
+    )
+    conn.commit()
+    if cursor.rowcount == 0:
+        raise RefreshTokenError("Invalid refresh token")
+
+
+def prune_refresh_tokens(conn: sqlite3.Connection) -> int:
+    """Delete families that can no longer be used."""
+    now = int(time.time())
+    cursor = conn.execute(
+        "DELETE FROM portal_refresh_tokens WHERE expires_at <= ? OR absolute_expires_at <= ?",
+        (now, now),
+    )
+    conn.commit()
+    return cursor.rowcount
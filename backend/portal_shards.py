@@ -0,0 +1,221 @@
+"""
+Per-location SQLite shards for the portal database.
+
+Each dojo location gets its own database file, so writers at one location never
+wait on another location's lock. Students are routed to a shard by:
+
+1. an explicit entry in the ``student_shards`` directory table (kept in the
+   default shard), for students whose ID does not follow a location prefix;
+2. the longest matching student-ID prefix from ``PORTAL_SHARD_PREFIXES``;
+3. the default shard.
+
+Configuration (both optional; without them everything stays in one file):
+
+    PORTAL_SHARDS="north=/data/portal-north.db,south=/data/portal-south.db"
+    PORTAL_SHARD_PREFIXES="ARN=north,ARS=south"
+
+``scripts/shard_students.py`` pins students to shards and moves rows that live
+in the wrong file (e.g. after shards are first configured).
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+DEFAULT_SHARD = "default"
+DIRECTORY_CACHE_SIZE = 4096
+DIRECTORY_CACHE_TTL_SECONDS = 60
+# Per-student tables moved between shards; ids are re-assigned on insert.
+STUDENT_TABLES = {
+    "students": ("id", ["id", "name", "birth_date", "phone", "email", "current_belt", "is_suspended",
+                        "suspended_reason", "suspended_at", "created_at", "updated_at"]),
+    "belt_progress": ("student_id", ["student_id", "belt_slug", "file_name", "uploaded_at", "created_at"]),
+    "login_events": ("student_id", ["student_id", "action", "actor", "created_at"]),
+}
+
+T = TypeVar("T")
+
+
+def _parse_pairs(raw: Optional[str]) -> List[Tuple[str, str]]:
+    pairs = []
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip() and value.strip():
+            pairs.append((name.strip(), value.strip()))
+    return pairs
+
+
+class ShardRouter:
+    def __init__(
+        self,
+        default_path: Path,
+        shards: Optional[Dict[str, Path]] = None,
+        prefixes: Optional[List[Tuple[str, str]]] = None,
+    ):
+        self.paths: Dict[str, Path] = {DEFAULT_SHARD: Path(default_path)}
+        for name, path in (shards or {}).items():
+            self.paths[name] = Path(path)
+        self.prefixes = sorted(
+            ((prefix.lower(), shard) for prefix, shard in (prefixes or [])),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        unknown = {shard for _, shard in self.prefixes} - set(self.paths)
+        if unknown:
+            raise ValueError(f"Shard prefixes reference unknown shard(s): {', '.join(sorted(unknown))}")
+        # lookup -> (cached_at, shard or None). Bounded because unknown IDs come
+        # straight from unauthenticated login attempts; the TTL lets assignments
+        # made by other processes (scripts/shard_students.py) show up.
+        self._directory_cache: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._directory_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=len(self.paths)) if len(self.paths) > 1 else None
+
+    @classmethod
+    def from_env(cls, default_path: Path, shards_spec: Optional[str], prefixes_spec: Optional[str]):
+        shards = {name: Path(path) for name, path in _parse_pairs(shards_spec)}
+        return cls(default_path, shards, _parse_pairs(prefixes_spec))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.paths)
+
+    def connect(self, shard: str = DEFAULT_SHARD) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.paths[shard])
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ensure_directory(self) -> None:
+        with self.connect(DEFAULT_SHARD) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS student_shards (
+                    student_id TEXT PRIMARY KEY COLLATE NOCASE,
+                    shard TEXT NOT NULL
+                )
+                """
+            )
+
+    def assign(self, student_id: str, shard: str) -> None:
+        """Pin a student to a shard in the directory table."""
+        if shard not in self.paths:
+            raise ValueError(f"Unknown shard: {shard}")
+        with self.connect(DEFAULT_SHARD) as conn:
+            conn.execute(
+                """
+                INSERT INTO student_shards (student_id, shard) VALUES (?, ?)
+                ON CONFLICT(student_id) DO UPDATE SET shard = excluded.shard
+                """,
+                (student_id.strip(), shard),
+            )
+        self._cache_directory(student_id.strip().lower(), shard)
+
+    def _cache_directory(self, lookup: str, shard: Optional[str]) -> None:
+        with self._directory_lock:
+            self._directory_cache[lookup] = (time.monotonic(), shard)
+            self._directory_cache.move_to_end(lookup)
+            while len(self._directory_cache) > DIRECTORY_CACHE_SIZE:
+                self._directory_cache.popitem(last=False)
+
+    def _directory_lookup(self, lookup: str) -> Optional[str]:
+        with self._directory_lock:
+            entry = self._directory_cache.get(lookup)
+            if entry is not None and time.monotonic() - entry[0] < DIRECTORY_CACHE_TTL_SECONDS:
+                self._directory_cache.move_to_end(lookup)
+                return entry[1]
+        conn = self.connect(DEFAULT_SHARD)
+        try:
+            row = conn.execute(
+                "SELECT shard FROM student_shards WHERE student_id = ?", (lookup,)
+            ).fetchone()
+        finally:
+            conn.close()
+        shard = row[0] if row and row[0] in self.paths else None
+        self._cache_directory(lookup, shard)
+        return shard
+
+    def shard_for(self, student_id: Optional[str]) -> str:
+        lookup = (student_id or "").strip().lower()
+        if not lookup or len(self.paths) == 1:
+            return DEFAULT_SHARD
+        shard = self._directory_lookup(lookup)
+        if shard:
+            return shard
+        for prefix, prefix_shard in self.prefixes:
+            if lookup.startswith(prefix):
+                return prefix_shard
+        return DEFAULT_SHARD
+
+    def move_student(self, student_id: str, source: str, target: str) -> Dict[str, int]:
+        """Move a student's rows from one shard file to another in a single transaction."""
+        if source not in self.paths or target not in self.paths:
+            raise ValueError(f"Unknown shard: {source if source not in self.paths else target}")
+        moved = {table: 0 for table in STUDENT_TABLES}
+        if source == target:
+            return moved
+        conn = sqlite3.connect(self.paths[target])
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (str(self.paths[source]),))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table, (key, columns) in STUDENT_TABLES.items():
+                    column_list = ", ".join(columns)
+                    conflict = " OR REPLACE" if table != "login_events" else ""
+                    cursor = conn.execute(
+                        f"INSERT{conflict} INTO main.{table} ({column_list})"
+                        f" SELECT {column_list} FROM source.{table} WHERE LOWER({key}) = LOWER(?)",
+                        (student_id,),
+                    )
+                    moved[table] = cursor.rowcount
+                    conn.execute(f"DELETE FROM source.{table} WHERE LOWER({key}) = LOWER(?)", (student_id,))
+                self._drop_moved_changes(conn, student_id)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return moved
+
+    @staticmethod
+    def _drop_moved_changes(conn: sqlite3.Connection, student_id: str) -> None:
+        """Forget the source shard's change-log entries for rows keyed by the moved student.
+
+        ``students`` and ``belt_progress`` sync to D1 by natural key, so the
+        target shard's upserts already cover them; left in place, the source
+        entries would sync as deletes and could reach D1 after the upserts
+        (shards sync independently). ``login_events`` sync by local id, so the
+        source deletes are kept and retire the old rows.
+        """
+        if not conn.execute(
+            "SELECT 1 FROM source.sqlite_master WHERE type = 'table' AND name = 'change_log'"
+        ).fetchone():
+            return
+        for table in ("students", "belt_progress"):
+            key = STUDENT_TABLES[table][0]
+            conn.execute(
+                f"DELETE FROM source.change_log WHERE table_name = ?"
+                f" AND LOWER(json_extract(row_key, '$.{key}')) = LOWER(?)",
+                (table, student_id),
+            )
+
+    def connect_for(self, student_id: Optional[str]) -> sqlite3.Connection:
+        return self.connect(self.shard_for(student_id))
+
+    def scatter(self, query: Callable[[sqlite3.Connection], T]) -> Dict[str, T]:
+        """Run ``query`` against every shard in parallel and return results by shard name."""
+
+        def run(shard: str) -> T:
+            conn = self.connect(shard)
+            try:
+                return query(conn)
+            finally:
+                conn.close()
+
+        if self._pool is None:
+            return {shard: run(shard) for shard in self.paths}
+        futures = {shard: self._pool.submit(run, shard) for shard in self.paths}
+        return {shard: future.result() for shard, future in futures.items()}
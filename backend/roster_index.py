@@ -0,0 +1,250 @@
+"""
+In-process type-ahead search over the student roster for the kiosk and admin panels.
+
+The index keeps, per student, the normalized name and ID (lowercased, accents
+stripped) and two lookup structures:
+
+* a sorted term list (name words, full name, ID) searched with ``bisect`` for
+  prefix matches;
+* trigram postings (``array('I')`` of document numbers) for infix matches such
+  as "ander" -> "Alexander".
+
+It is refreshed incrementally from the ``change_log`` rows that the change
+capture triggers write for ``students``. A cheap ``PRAGMA data_version`` check
+on a dedicated read connection means an unchanged roster costs no queries.
+Updated and deleted students leave tombstones that are compacted away once
+they make up a quarter of the index, which keeps memory bounded by the roster
+size.
+"""
+
+import heapq
+import json
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+COMPACT_RATIO = 0.25
+
+
+def normalize(text: Optional[str]) -> str:
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in stripped.casefold())
+    return " ".join(cleaned.split())
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class RosterIndex:
+    def __init__(self, router):
+        self.router = router
+        self._lock = threading.Lock()
+        self._connections: Dict[str, sqlite3.Connection] = {}
+        self._data_versions: Dict[str, Optional[int]] = {}
+        self._last_seq: Dict[str, int] = {}
+        self._reset()
+
+    def _reset(self) -> None:
+        # docs[n] is (shard, id, name, belt, suspended, norm_id, norm_name) or None once superseded.
+        self._docs: List[Optional[Tuple[str, str, str, Optional[str], bool, str, str]]] = []
+        self._doc_by_key: Dict[Tuple[str, str], int] = {}
+        self._terms: List[str] = []
+        self._term_docs = array("I")
+        self._grams: Dict[str, array] = {}
+        self._tombstones = 0
+
+    def _connection(self, shard: str) -> sqlite3.Connection:
+        conn = self._connections.get(shard)
+        if conn is None:
+            conn = sqlite3.connect(self.router.paths[shard], check_same_thread=False)
+            self._connections[shard] = conn
+        return conn
+
+    # -- maintenance -------------------------------------------------------
+
+    def _add(
+        self,
+        shard: str,
+        student_id: str,
+        name: str,
+        belt: Optional[str],
+        suspended: bool,
+        bulk: bool = False,
+    ) -> None:
+        key = (shard, student_id.lower())
+        self._remove(key)
+        norm_name = normalize(name)
+        norm_id = normalize(student_id)
+        doc = len(self._docs)
+        self._docs.append((shard, student_id, name, belt, bool(suspended), norm_id, norm_name))
+        self._doc_by_key[key] = doc
+
+        terms = set(norm_name.split()) | {norm_name, norm_id, student_id.lower()}
+        for term in terms:
+            if not term:
+                continue
+            if bulk:
+                # Caller sorts once afterwards via _sort_terms().
+                self._terms.append(term)
+                self._term_docs.append(doc)
+                continue
+            position = bisect_left(self._terms, term)
+            self._terms.insert(position, term)
+            self._term_docs.insert(position, doc)
+        for gram in trigrams(norm_name) | trigrams(norm_id):
+            self._grams.setdefault(gram, array("I")).append(doc)
+
+    def _sort_terms(self) -> None:
+        pairs = sorted(zip(self._terms, self._term_docs))
+        self._terms = [term for term, _ in pairs]
+        self._term_docs = array("I", (doc for _, doc in pairs))
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        doc = self._doc_by_key.pop(key, None)
+        if doc is not None and self._docs[doc] is not None:
+            self._docs[doc] = None
+            self._tombstones += 1
+
+    def _compact(self) -> None:
+        live = [entry for entry in self._docs if entry is not None]
+        self._reset()
+        for shard, student_id, name, belt, suspended, _, _ in live:
+            self._add(shard, student_id, name, belt, suspended, bulk=True)
+        self._sort_terms()
+
+    def _rebuild_shard(self, shard: str, conn: sqlite3.Connection) -> None:
+        for key in [key for key in self._doc_by_key if key[0] == shard]:
+            self._remove(key)
+        conn.execute("BEGIN")
+        try:
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            rows = conn.execute("SELECT id, name, current_belt, is_suspended FROM students").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        for student_id, name, belt, suspended in rows:
+            self._add(shard, student_id, name, belt, suspended, bulk=True)
+        self._sort_terms()
+        self._last_seq[shard] = last_seq
+
+    def _apply_changes(self, shard: str, conn: sqlite3.Connection) -> None:
+        last_seq = self._last_seq.get(shard)
+        pruned_floor = conn.execute("SELECT COALESCE(MIN(last_seq), 0) FROM sync_state").fetchone()[0]
+        if last_seq is None or pruned_floor > last_seq:
+            # Either first load or the D1 sync pruned entries we never saw.
+            self._rebuild_shard(shard, conn)
+            return
+
+        changes = conn.execute(
+            """
+            SELECT seq, row_key FROM change_log
+            WHERE seq > ? AND table_name = 'students'
+            ORDER BY seq
+            """,
+            (last_seq,),
+        ).fetchall()
+        for seq, row_key in changes:
+            student_id = (json.loads(row_key).get("id") or "").strip()
+            row = conn.execute(
+                "SELECT id, name, current_belt, is_suspended FROM students WHERE id = ?",
+                (student_id,),
+            ).fetchone()
+            if row:
+                self._add(shard, *row)
+            else:
+                self._remove((shard, student_id.lower()))
+            last_seq = seq
+        self._last_seq[shard] = last_seq
+
+    def refresh(self) -> None:
+        """Apply roster changes committed since the last call (cheap when nothing changed)."""
+        with self._lock:
+            for shard in self.router.names:
+                conn = self._connection(shard)
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if self._data_versions.get(shard) == version and shard in self._last_seq:
+                    continue
+                self._apply_changes(shard, conn)
+                self._data_versions[shard] = version
+            if self._docs and self._tombstones / len(self._docs) > COMPACT_RATIO:
+                self._compact()
+
+    # -- queries ---------------------------------------------------------------
+
+    def _prefix_docs(self, token: str) -> Set[int]:
+        start = bisect_left(self._terms, token)
+        end = bisect_left(self._terms, token + "\uffff")
+        return set(self._term_docs[start:end])
+
+    def _infix_docs(self, token: str) -> Set[int]:
+        grams = sorted(trigrams(token), key=lambda gram: len(self._grams.get(gram, ())))
+        if not grams:
+            return set()
+        candidates = set(self._grams.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(self._grams.get(gram, ()))
+        return {
+            doc
+            for doc in candidates
+            if self._docs[doc] and (token in self._docs[doc][5] or token in self._docs[doc][6])
+        }
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        tokens = normalize(query).split()
+        if not tokens:
+            return []
+        limit = max(1, min(MAX_LIMIT, limit))
+
+        with self._lock:
+            matched: Optional[Set[int]] = None
+            prefix_hits: Set[int] = set()
+            for token in tokens:
+                prefix = self._prefix_docs(token)
+                # Infix hits always rank below prefix hits, so a single token with
+                # enough prefix hits can skip the trigram intersection entirely.
+                wants_infix = len(token) >= 3 and (len(tokens) > 1 or len(prefix) < limit)
+                docs = prefix | self._infix_docs(token) if wants_infix else prefix
+                prefix_hits |= prefix
+                matched = docs if matched is None else matched & docs
+                if not matched:
+                    return []
+
+            needle = normalize(query)
+            ranked = []
+            for doc in matched:
+                entry = self._docs[doc]
+                if entry is None:
+                    continue
+                norm_id = entry[5]
+                if norm_id == needle:
+                    rank = 0
+                elif norm_id.startswith(needle):
+                    rank = 1
+                elif doc in prefix_hits:
+                    rank = 2
+                else:
+                    rank = 3
+                ranked.append((rank, entry[6], doc))
+            best = [self._docs[doc] for _, _, doc in heapq.nsmallest(limit, ranked)]
+
+        return [
+            {"id": student_id, "name": name, "currentBelt": belt, "isSuspended": suspended}
+            for _, student_id, name, belt, suspended, _, _ in best
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "students": len(self._doc_by_key),
+                "terms": len(self._terms),
+                "trigrams": len(self._grams),
+                "tombstones": self._tombstones,
+            }
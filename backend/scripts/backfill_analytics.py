@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Rebuild the admin analytics rollup tables from the raw portal tables.
+
+The rollups are normally maintained by triggers at write time; run this after
+bulk edits made with the triggers missing, or to repair drift.
+
+Usage:
+    python backend/scripts/backfill_analytics.py --db backend/portal.db
+
+    # Every shard from PORTAL_SHARDS (see backend/portal_shards.py)
+    python backend/scripts/backfill_analytics.py --all-shards
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from portal_analytics import backfill_rollups, ensure_analytics, rollup_stats  # noqa: E402
+from portal_shards import ShardRouter  # noqa: E402
+
+DEFAULT_DB_PATH = Path(os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent.parent / "portal.db"))
+
+
+def backfill(db_path: Path) -> None:
+    if not db_path.exists():
+        raise SystemExit(f"Database not found: {db_path}")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        started = time.perf_counter()
+        if ensure_analytics(conn):
+            # Installing the triggers already backfilled the rollups.
+            print(f"Installed analytics triggers in {db_path}.")
+            stats = rollup_stats(conn)
+        else:
+            stats = backfill_rollups(conn)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    print(
+        f"{db_path}: rebuilt {stats['rollupRows']} rollup row(s) and {stats['activeStudentRows']}"
+        f" active-student row(s) in {elapsed:.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill portal analytics rollups.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB_PATH,
+        help=f"Path to the portal SQLite DB (default: {DEFAULT_DB_PATH})",
+    )
+    parser.add_argument(
+        "--all-shards",
+        action="store_true",
+        help="Backfill --db and every shard listed in PORTAL_SHARDS.",
+    )
+    args = parser.parse_args()
+
+    paths = [args.db]
+    if args.all_shards:
+        paths = list(ShardRouter.from_env(args.db, os.getenv("PORTAL_SHARDS"), None).paths.values())
+    for path in paths:
+        backfill(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Compare the portal bootstrap endpoint against the older multi-call flow.
+
+Seeds a throwaway SQLite database, then times `/portal/profile` +
+`/portal/progress/<id>` + the week-theme JSON fetch against a single
+`/portal/bootstrap` call, reporting bytes on the wire and per-flow latency.
+
+Usage:
+    python backend/scripts/bench_bootstrap.py --iterations 500 --records 14
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def seed_database(db_path: Path, student_id: str, records: int) -> None:
+    import sqlite3
+
+    belts = [
+        "white", "high-white", "yellow", "high-yellow", "green", "high-green", "blue",
+        "high-blue", "red", "high-red", "black", "black-2nd-dan", "black-3rd-dan", "black-4th-dan",
+    ]
+    now = "2026-01-01T00:00:00Z"
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO students (id, name, birth_date, current_belt, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (student_id, "Benchmark Student", "2012-05-01", "High Blue Belt", now, now),
+        )
+        for index in range(records):
+            slug = belts[index % len(belts)] + ("" if index < len(belts) else f"-{index}")
+            conn.execute(
+                "INSERT OR REPLACE INTO belt_progress (student_id, belt_slug, file_name, uploaded_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (student_id, slug, f"{slug}-checklist.png", now, now),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def time_flow(flow: Callable[[], int], iterations: int) -> Dict[str, float]:
+    samples: List[float] = []
+    size = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        size = flow()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "bytes": size,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /portal/bootstrap against the multi-call flow.")
+    parser.add_argument("--iterations", type=int, default=300, help="Requests per flow (default: 300)")
+    parser.add_argument("--records", type=int, default=14, help="belt_progress rows to seed (default: 14)")
+    parser.add_argument(
+        "--encoding",
+        default="gzip, deflate, br",
+        help="Accept-Encoding header sent by the simulated browser.",
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="portal-bench-")
+    db_path = Path(workdir) / "portal.db"
+    os.environ["PORTAL_DB_PATH"] = str(db_path)
+    os.environ.setdefault("PORTAL_JWT_SECRET", "benchmark-secret-with-enough-bytes-for-hs256")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import app as portal_app
+
+    student_id = "ARA-BENCH"
+    seed_database(db_path, student_id, args.records)
+    token = portal_app.issue_portal_token(student_id)
+    headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": args.encoding}
+    client = portal_app.app.test_client()
+    week_theme_path = BACKEND_DIR.parent / "assets" / "data" / "week-theme.json"
+
+    def multi_call() -> int:
+        total = 0
+        for url in ("/portal/profile", f"/portal/progress/{student_id}"):
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200, response.data
+            total += len(response.data)
+        # The week theme is a separate static fetch in the old flow.
+        total += len(week_theme_path.read_bytes())
+        return total
+
+    def bootstrap() -> int:
+        response = client.get("/portal/bootstrap", headers=headers)
+        assert response.status_code == 200, response.data
+        return len(response.data)
+
+    results = {
+        "multi-call": time_flow(multi_call, args.iterations),
+        "bootstrap": time_flow(bootstrap, args.iterations),
+    }
+
+    print(f"{'flow':<12} {'bytes':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, stats in results.items():
+        print(
+            f"{name:<12} {stats['bytes']:>8} {stats['mean_ms']:>9.3f}"
+            f" {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f}"
+        )
+    print("Note: multi-call bytes exclude belt material metadata, which the old flow hard-codes client-side.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Build the content-hashed manifest for study materials and belt images.
+
+Scans ``assets/materials`` (curriculum PNGs, PDFs and markdown guides) and
+``assets/Images/belts`` (SVGs), copies each match to
+``assets/hashed/<same relative path with .<hash> before the extension>`` and
+writes ``assets/data/asset-manifest.json``. Anything else in those folders
+(staff photos, flyers, ``student-information-*`` scans) is never published:
+
+    {
+      "version": "3f0c9a1b2d4e",
+      "generatedAt": "2026-01-05T18:00:00Z",
+      "assets": {
+        "materials/blue-belt-study-guide.md": {
+          "url": "assets/hashed/materials/blue-belt-study-guide.1a2b3c4d5e.md",
+          "sha256": "...", "size": 2048, "mtimeNs": ..., "kind": "studyGuide", "beltSlug": "blue"
+        }
+      },
+      "belts": {"blue": ["materials/blue-belt-study-guide.md", ...]}
+    }
+
+Rebuilds are incremental: a file whose size and mtime match the previous
+manifest is not re-read, and a file whose content did not change keeps its
+hashed name, so its URL stays cached in browsers. The manifest file itself is
+only rewritten when something changed. Hashed copies from older builds are kept
+(clients holding an older manifest still resolve them) unless ``--prune`` is
+given; run with ``--prune`` once to drop copies of files that are no longer
+eligible.
+
+Usage:
+    python backend/scripts/build_asset_manifest.py
+    python backend/scripts/build_asset_manifest.py --prune --verbose
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import quote
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from portal_assets import (  # noqa: E402
+    ASSETS_DIR,
+    BELT_IMAGES_DIR,
+    HASHED_DIR,
+    MANIFEST_PATH,
+    MATERIALS_DIR,
+    describe_asset,
+)
+
+HASH_LENGTH = 10
+HASHED_URL_PREFIX = "assets/hashed"
+CHUNK_SIZE = 1 << 16
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_relative_path(relative: str, sha256: str) -> str:
+    path = Path(relative)
+    return path.with_name(f"{path.stem}.{sha256[:HASH_LENGTH]}{path.suffix}").as_posix()
+
+
+# Only these files get public, immutable hashed copies (see _headers).
+PUBLISHED = (
+    (MATERIALS_DIR, ("tkd-curriculum-*.png", "*.pdf", "*.md")),
+    (BELT_IMAGES_DIR, ("*.svg",)),
+)
+PRIVATE_PREFIXES = ("student-information-",)
+
+
+def source_files(published=PUBLISHED) -> Iterable[Path]:
+    for directory, patterns in published:
+        if not directory.is_dir():
+            continue
+        yield from sorted(
+            path
+            for path in directory.iterdir()
+            if path.is_file()
+            and not path.name.startswith((".",) + PRIVATE_PREFIXES)
+            and any(path.match(pattern) for pattern in patterns)
+        )
+
+
+def load_previous(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def build_manifest(
+    manifest_path: Path = MANIFEST_PATH,
+    hashed_dir: Path = HASHED_DIR,
+    prune: bool = False,
+    verbose: bool = False,
+) -> Dict[str, Any]:
+    previous = load_previous(manifest_path)
+    previous_assets = previous.get("assets") or {}
+    assets: Dict[str, Dict[str, Any]] = {}
+    stats = {"files": 0, "hashed": 0, "copied": 0, "pruned": 0}
+
+    for path in source_files():
+        relative = path.relative_to(ASSETS_DIR).as_posix()
+        stat = path.stat()
+        cached: Optional[Dict[str, Any]] = previous_assets.get(relative)
+        if cached and cached.get("size") == stat.st_size and cached.get("mtimeNs") == stat.st_mtime_ns:
+            sha256 = cached["sha256"]
+        else:
+            sha256 = file_sha256(path)
+            stats["hashed"] += 1
+
+        hashed_relative = hashed_relative_path(relative, sha256)
+        target = hashed_dir / hashed_relative
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partial = target.with_name(target.name + ".partial")
+            shutil.copy2(path, partial)
+            partial.replace(target)
+            stats["copied"] += 1
+            if verbose:
+                print(f"copied {relative} -> {hashed_relative}")
+
+        assets[relative] = {
+            "url": f"{HASHED_URL_PREFIX}/{quote(hashed_relative)}",
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtimeNs": stat.st_mtime_ns,
+            **describe_asset(path),
+        }
+        stats["files"] += 1
+
+    belts: Dict[str, list] = {}
+    for relative, entry in assets.items():
+        if entry["beltSlug"]:
+            belts.setdefault(entry["beltSlug"], []).append(relative)
+
+    version = hashlib.sha256(
+        "\n".join(f"{relative} {entry['sha256']}" for relative, entry in sorted(assets.items())).encode("utf-8")
+    ).hexdigest()[:12]
+    manifest = {
+        "version": version,
+        "generatedAt": previous.get("generatedAt"),
+        "assets": assets,
+        "belts": belts,
+    }
+    # Keep the file byte-identical when nothing changed so its mtime (and any
+    # cached copy of the manifest) stays valid.
+    if manifest != previous:
+        manifest["generatedAt"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = manifest_path.with_name(manifest_path.name + ".partial")
+        with partial.open("w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        partial.replace(manifest_path)
+        stats["written"] = True
+    else:
+        manifest = previous
+        stats["written"] = False
+
+    if prune and hashed_dir.is_dir():
+        keep = {hashed_dir / hashed_relative_path(relative, entry["sha256"]) for relative, entry in assets.items()}
+        for path in hashed_dir.rglob("*"):
+            if path.is_file() and path not in keep:
+                path.unlink()
+                stats["pruned"] += 1
+                if verbose:
+                    print(f"pruned {path.relative_to(hashed_dir).as_posix()}")
+
+    stats["version"] = manifest["version"]
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the content-hashed study material manifest.")
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=MANIFEST_PATH,
+        help=f"Manifest output path (default: {MANIFEST_PATH})",
+    )
+    parser.add_argument(
+        "--hashed-dir",
+        type=Path,
+        default=HASHED_DIR,
+        help=f"Directory for hash-suffixed copies, served as /{HASHED_URL_PREFIX} (default: {HASHED_DIR})",
+    )
+    parser.add_argument("--prune", action="store_true", help="Delete hashed copies the manifest no longer uses.")
+    parser.add_argument("--verbose", action="store_true", help="Print every copied or pruned file.")
+    args = parser.parse_args()
+
+    stats = build_manifest(args.manifest, args.hashed_dir, prune=args.prune, verbose=args.verbose)
+    print(json.dumps(stats, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,15 +16,24 @@ Usage:
         }
 
 Keep the JSON file outside of the repository so sensitive data never lands in git.
+
+With PORTAL_SHARDS / PORTAL_SHARD_PREFIXES set, each student is written to the
+shard their ID routes to (see backend/portal_shards.py); --truncate clears every
+shard. Use --shard to pin all imported students to one shard instead.
 """
 
 import argparse
 import json
 import os
 import sqlite3
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from portal_shards import DEFAULT_SHARD, ShardRouter  # noqa: E402
 
 DEFAULT_DB_PATH = Path(
     os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent.parent / "portal.db")
@@ -62,7 +71,7 @@ def load_students(path: Path) -> List[Dict[str, Any]]:
 
 
 def import_students(roster: List[Dict[str, Any]], db_path: Path, truncate: bool = False) -> int:
-    if not roster:
+    if not roster and not truncate:
         return 0
     db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(db_path)
@@ -121,6 +130,27 @@ def import_students(roster: List[Dict[str, Any]], db_path: Path, truncate: bool
     return len(roster)
 
 
+def import_sharded(
+    roster: List[Dict[str, Any]],
+    router: ShardRouter,
+    truncate: bool = False,
+    pin_shard: Optional[str] = None,
+) -> Dict[str, int]:
+    """Split the roster by shard and import each part into its own database file."""
+    router.paths[DEFAULT_SHARD].parent.mkdir(parents=True, exist_ok=True)
+    router.ensure_directory()
+    if pin_shard:
+        for record in roster:
+            router.assign(record["id"], pin_shard)
+    groups: Dict[str, List[Dict[str, Any]]] = {shard: [] for shard in router.names}
+    for record in roster:
+        groups[router.shard_for(record["id"])].append(record)
+    return {
+        shard: import_students(records, router.paths[shard], truncate=truncate)
+        for shard, records in groups.items()
+    }
+
+
 def emit_d1_sql(roster: List[Dict[str, Any]], sql_path: Path, truncate: bool = False) -> None:
     def sql_value(value: Any) -> str:
         if value is None:
@@ -173,6 +203,7 @@ def main():
         type=Path,
         help="Optional path to write SQL upserts that can be applied with `wrangler d1 execute`.",
     )
+    parser.add_argument("--shard", help="Pin every imported student to this shard.")
     args = parser.parse_args()
 
     if not args.source.exists():
@@ -183,8 +214,14 @@ def main():
         emit_d1_sql(roster, args.d1_sql, truncate=args.truncate)
         print(f"Wrote D1 SQL script to {args.d1_sql}")
 
-    imported = import_students(roster, args.db, truncate=args.truncate)
-    print(f"Imported {imported} student record(s) into {args.db}")
+    try:
+        router = ShardRouter.from_env(args.db, os.getenv("PORTAL_SHARDS"), os.getenv("PORTAL_SHARD_PREFIXES"))
+        imported = import_sharded(roster, router, truncate=args.truncate, pin_shard=args.shard)
+    except ValueError as error:
+        raise SystemExit(str(error)) from error
+    for shard, count in imported.items():
+        if count or args.truncate:
+            print(f"Imported {count} student record(s) into {router.paths[shard]}")
 
 
 if __name__ == "__main__":
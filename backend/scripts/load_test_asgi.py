@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Load test for the ASGI entry point: slow /chat calls and portal reads in one process.
+
+The OpenAI client is replaced with a stub that sleeps for --upstream-delay
+seconds, so the test needs no API key and no network. It fires --chat chat
+requests and --portal /portal/bootstrap requests at the same time and
+reports portal latency next to a portal-only baseline. Without head-of-line
+blocking the two portal numbers stay close even though every chat request is
+still waiting on its upstream.
+
+Usage:
+    python backend/scripts/load_test_asgi.py --chat 200 --portal 500 --upstream-delay 2
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "max_ms": samples[-1] * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+
+async def timed(coro_factory, samples: List[float]):
+    started = time.perf_counter()
+    response = await coro_factory()
+    samples.append(time.perf_counter() - started)
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.url} -> {response.status_code}: {response.text}")
+
+
+async def run(args) -> None:
+    import httpx
+
+    import asgi
+
+    async def fake_create(**_kwargs):
+        await asyncio.sleep(args.upstream_delay)
+        message = SimpleNamespace(content="Stubbed answer")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    asgi.chat_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=fake_create))
+    )
+
+    student_id = "ARA-LOAD"
+    conn = sqlite3.connect(os.environ["PORTAL_DB_PATH"])
+    conn.execute(
+        "INSERT OR REPLACE INTO students (id, name, birth_date, current_belt, created_at, updated_at)"
+        " VALUES (?, 'Load Test', '2012-01-01', 'Green Belt', 'x', 'x')",
+        (student_id,),
+    )
+    conn.commit()
+    conn.close()
+    headers = {"Authorization": f"Bearer {asgi.portal_app.issue_portal_token(student_id)}"}
+
+    transport = httpx.ASGITransport(app=asgi.application)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://portal.test", limits=limits) as client:
+        def portal():
+            return client.get("/portal/bootstrap", headers=headers)
+
+        def chat():
+            return client.post("/chat", json={"message": "What do I need for my green belt test?"})
+
+        baseline: List[float] = []
+        await asyncio.gather(*(timed(portal, baseline) for _ in range(args.portal)))
+
+        chat_samples: List[float] = []
+        mixed: List[float] = []
+        started = time.perf_counter()
+        chat_tasks = [asyncio.create_task(timed(chat, chat_samples)) for _ in range(args.chat)]
+        await asyncio.sleep(0.05)  # let every chat request reach its upstream call
+        await asyncio.gather(*(timed(portal, mixed) for _ in range(args.portal)))
+        portal_done = time.perf_counter() - started
+        await asyncio.gather(*chat_tasks)
+        total = time.perf_counter() - started
+
+    print(f"workers={asgi.ASGI_WORKERS} chat={args.chat} portal={args.portal} upstream_delay={args.upstream_delay}s")
+    print(f"{'series':<22} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, samples in (
+        ("portal (alone)", baseline),
+        ("portal (during chat)", mixed),
+        ("chat", chat_samples),
+    ):
+        stats = summarize(samples)
+        print(f"{name:<22} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    print(f"portal burst finished after {portal_done:.2f}s; all chat requests after {total:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mixed /chat + portal load test for the ASGI app.")
+    parser.add_argument("--chat", type=int, default=100, help="Concurrent /chat requests (default: 100)")
+    parser.add_argument("--portal", type=int, default=300, help="Portal requests per phase (default: 300)")
+    parser.add_argument("--upstream-delay", type=float, default=2.0, help="Stubbed upstream latency in seconds.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="portal-load-")
+    os.environ["PORTAL_DB_PATH"] = str(Path(workdir) / "portal.db")
+    os.environ.setdefault("PORTAL_JWT_SECRET", "load-test-secret-with-enough-bytes-for-hs256")
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
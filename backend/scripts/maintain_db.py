@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Run maintenance on the portal SQLite database: online backups, PRAGMA optimize /
+ANALYZE, WAL checkpoints and incremental vacuum.
+
+Usage:
+    # Everything once (forced), e.g. from cron
+    python backend/scripts/maintain_db.py --backup-dir /secure/backups --once
+
+    # Keep running; backups every 6h, optimize hourly, checkpoint/vacuum when quiet
+    python backend/scripts/maintain_db.py --backup-dir /secure/backups --interval 60
+
+    # One-off switches (the vacuum switch rewrites the file; run off-hours)
+    python backend/scripts/maintain_db.py --enable-wal --enable-incremental-vacuum --once
+
+Keep the backup directory outside the repository; it contains student PII.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db_maintenance import (  # noqa: E402
+    MaintenanceScheduler,
+    enable_incremental_vacuum,
+    enable_wal,
+)
+
+DEFAULT_DB_PATH = Path(os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent.parent / "portal.db"))
+
+
+def print_report(entry) -> None:
+    print(json.dumps(entry, sort_keys=True), flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Portal database maintenance.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB_PATH,
+        help=f"Path to the portal SQLite DB (default: {DEFAULT_DB_PATH})",
+    )
+    parser.add_argument("--backup-dir", type=Path, help="Directory for online backup snapshots.")
+    parser.add_argument("--keep", type=int, default=7, help="Backup snapshots to keep (default: 7).")
+    parser.add_argument("--once", action="store_true", help="Run every task once and exit.")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between ticks (default: 60).")
+    parser.add_argument("--backup-every", type=float, default=6 * 3600, help="Seconds between backups.")
+    parser.add_argument("--optimize-every", type=float, default=3600, help="Seconds between PRAGMA optimize runs.")
+    parser.add_argument("--enable-wal", action="store_true", help="Switch the database to WAL journaling.")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Switch to auto_vacuum=INCREMENTAL (runs a full VACUUM once).",
+    )
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        raise SystemExit(f"Database not found: {args.db}")
+
+    scheduler = MaintenanceScheduler(
+        args.db,
+        backup_dir=args.backup_dir,
+        backup_every=args.backup_every,
+        optimize_every=args.optimize_every,
+        keep=args.keep,
+        report=print_report,
+    )
+    try:
+        conn = scheduler.connection()
+        if args.enable_wal:
+            print_report({"task": "enable_wal", "journalMode": enable_wal(conn)})
+        if args.enable_incremental_vacuum:
+            started = time.perf_counter()
+            enable_incremental_vacuum(conn)
+            print_report(
+                {
+                    "task": "enable_incremental_vacuum",
+                    "durationMs": round((time.perf_counter() - started) * 1000, 2),
+                }
+            )
+
+        if args.once:
+            scheduler.tick(force=True)
+            return
+        while True:
+            scheduler.tick()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
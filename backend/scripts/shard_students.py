@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Manage which shard holds each student (see backend/portal_shards.py).
+
+Uses the same PORTAL_DB_PATH / PORTAL_SHARDS / PORTAL_SHARD_PREFIXES settings as
+the app. Start the app once with the shard settings first so every shard file
+has its tables.
+
+Usage:
+    # Students per shard, and how many live somewhere other than their route
+    python backend/scripts/shard_students.py status
+
+    # Pin a student whose ID has no location prefix, and move their rows
+    python backend/scripts/shard_students.py assign ARA042 north --move
+
+    # Running apps keep their cached route for up to a minute after a move, so
+    # logins or uploads can still land in the old shard; sweep them up with
+    python backend/scripts/shard_students.py rebalance
+
+    # Move every student to the shard their ID now routes to (e.g. after
+    # PORTAL_SHARD_PREFIXES was introduced on an existing single-file portal)
+    python backend/scripts/shard_students.py rebalance --dry-run
+    python backend/scripts/shard_students.py rebalance
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from portal_shards import STUDENT_TABLES, ShardRouter  # noqa: E402
+
+DEFAULT_DB_PATH = Path(os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent.parent / "portal.db"))
+
+
+def load_router(db_path: Path) -> ShardRouter:
+    router = ShardRouter.from_env(db_path, os.getenv("PORTAL_SHARDS"), os.getenv("PORTAL_SHARD_PREFIXES"))
+    for shard, path in router.paths.items():
+        with router.connect(shard) as conn:
+            missing = [
+                table
+                for table in STUDENT_TABLES
+                if not conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+            ]
+        if missing:
+            raise SystemExit(f"Shard {shard} ({path}) is missing table(s) {', '.join(missing)}; start the app once first.")
+    router.ensure_directory()
+    return router
+
+
+def students_by_shard(router: ShardRouter) -> Dict[str, List[str]]:
+    """Student IDs with rows in each shard, from every per-student table.
+
+    A running app may keep routing a moved student to the old shard until its
+    directory cache expires, so uploads and logins can land there after the
+    student row has moved; those rows show up here and ``rebalance`` moves them.
+    """
+
+    def shard_ids(conn) -> List[str]:
+        # Prefer the spelling on the students row when the tables disagree on case.
+        ids: Dict[str, str] = {}
+        for table, (key, _) in STUDENT_TABLES.items():
+            for (student_id,) in conn.execute(f"SELECT DISTINCT {key} FROM {table} WHERE {key} IS NOT NULL"):
+                ids.setdefault(student_id.lower(), student_id)
+        return sorted(ids.values(), key=str.lower)
+
+    return router.scatter(shard_ids)
+
+
+def misplaced(router: ShardRouter) -> List[tuple]:
+    return [
+        (student_id, shard, router.shard_for(student_id))
+        for shard, ids in students_by_shard(router).items()
+        for student_id in ids
+        if router.shard_for(student_id) != shard
+    ]
+
+
+def cmd_status(router: ShardRouter, args) -> None:
+    for shard, ids in students_by_shard(router).items():
+        print(f"{shard:<12} {len(ids):>6} student(s)  {router.paths[shard]}")
+    wrong = misplaced(router)
+    print(f"{len(wrong)} student(s) stored outside the shard their ID routes to")
+
+
+def cmd_assign(router: ShardRouter, args) -> None:
+    router.assign(args.student_id, args.shard)
+    print(f"Pinned {args.student_id} to {args.shard}")
+    if not args.move:
+        return
+    for shard, ids in students_by_shard(router).items():
+        if shard != args.shard and args.student_id.lower() in {student_id.lower() for student_id in ids}:
+            moved = router.move_student(args.student_id, shard, args.shard)
+            print(f"Moved {args.student_id} from {shard}: {moved}")
+
+
+def cmd_rebalance(router: ShardRouter, args) -> None:
+    wrong = misplaced(router)
+    for student_id, source, target in wrong:
+        if args.dry_run:
+            print(f"would move {student_id}: {source} -> {target}")
+            continue
+        moved = router.move_student(student_id, source, target)
+        print(f"moved {student_id}: {source} -> {target} {moved}")
+    print(f"{'Would move' if args.dry_run else 'Moved'} {len(wrong)} student(s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Assign and move students between portal shards.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB_PATH,
+        help=f"Path to the default-shard SQLite DB (default: {DEFAULT_DB_PATH})",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    status = sub.add_parser("status", help="Student counts per shard.")
+    status.set_defaults(func=cmd_status)
+
+    assign = sub.add_parser("assign", help="Pin a student to a shard in the directory table.")
+    assign.add_argument("student_id")
+    assign.add_argument("shard")
+    assign.add_argument("--move", action="store_true", help="Also move the student's existing rows.")
+    assign.set_defaults(func=cmd_assign)
+
+    rebalance = sub.add_parser("rebalance", help="Move students stored outside the shard they route to.")
+    rebalance.add_argument("--dry-run", action="store_true", help="Only list the moves.")
+    rebalance.set_defaults(func=cmd_rebalance)
+
+    args = parser.parse_args()
+    try:
+        router = load_router(args.db)
+        args.func(router, args)
+    except (ValueError, sqlite3.Error) as error:
+        raise SystemExit(str(error)) from error
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Incremental sync from the local portal database to Cloudflare D1.
+
+Reads the trigger-maintained `change_log` (see backend/change_capture.py) past
+the last acknowledged sequence number and writes idempotent SQL batches that
+can be applied with `wrangler d1 execute --file`. Only rows that changed since
+the last sync are emitted, and every batch is safe to re-apply.
+
+Usage:
+    # Write delta batches and remember the new high-water mark
+    python backend/scripts/sync_d1.py emit --out /tmp/d1-delta --advance
+
+    # Or advance the mark only after wrangler applied the files
+    python backend/scripts/sync_d1.py emit --out /tmp/d1-delta
+    python backend/scripts/sync_d1.py ack --seq 1234
+
+    # Verify: print the checksum query, run it on D1, compare the results
+    python backend/scripts/sync_d1.py checksum --print-query > /tmp/checksum.sql
+    npx wrangler d1 execute <db> --remote --json --file /tmp/checksum.sql > /tmp/remote.json
+    python backend/scripts/sync_d1.py checksum --remote /tmp/remote.json
+
+login_events rows carry an ``origin_id`` in D1 ("<origin>:<local id>", where
+the origin defaults to the database file stem, e.g. "portal"), so events that
+share a second stay separate. Apply worker/db/migrations/014_login_events_origin.sql
+to D1 first. Rows synced before that migration have no origin_id; the first
+batch after upgrading adopts them by natural key instead of inserting copies.
+
+The Worker writes to the same D1 tables, so the checksum only covers rows that
+came from this database: students and belt_progress by the local keys (the
+query embeds them, so print it from the same --db), login_events by origin.
+
+With PORTAL_SHARDS configured, every shard file has its own change_log and
+sync_state, so run emit/ack once per shard with --db and a separate --out
+directory; the seq numbers are per shard:
+
+    python backend/scripts/sync_d1.py --db /data/portal-north.db emit --out /tmp/d1-north --advance
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from change_capture import SYNC_TABLES, ensure_change_capture  # noqa: E402
+
+DEFAULT_DB_PATH = Path(os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent.parent / "portal.db"))
+DEFAULT_TARGET = "d1"
+DEFAULT_BATCH_SIZE = 500
+# Rows written by the Worker have NULL origin_id; synced rows never do.
+ORIGIN_TABLE = "login_events"
+
+
+def sql_value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def _where(columns: Sequence[str], values: Sequence[Any]) -> str:
+    return " AND ".join(
+        f"{column} IS NULL" if value is None else f"{column} = {sql_value(value)}"
+        for column, value in zip(columns, values)
+    )
+
+
+def origin_id(origin: str, local_id: Any) -> str:
+    return f"{origin}:{local_id}"
+
+
+def origin_event_upsert(row: Dict[str, Any], origin: str) -> str:
+    """Insert one login event keyed by origin_id, adopting a pre-origin copy if D1 has one."""
+    event_origin = sql_value(origin_id(origin, row["id"]))
+    fields = ["student_id", "action", "actor", "created_at"]
+    values = ", ".join(sql_value(row[column]) for column in fields)
+    natural = _where(fields, [row[column] for column in fields])
+    return (
+        f"UPDATE {ORIGIN_TABLE} SET origin_id = {event_origin} WHERE id = ("
+        f"SELECT id FROM {ORIGIN_TABLE} WHERE origin_id IS NULL AND {natural} ORDER BY id LIMIT 1)"
+        f" AND NOT EXISTS (SELECT 1 FROM {ORIGIN_TABLE} WHERE origin_id = {event_origin});\n"
+        f"INSERT INTO {ORIGIN_TABLE} (origin_id, {', '.join(fields)}) VALUES ({event_origin}, {values})"
+        f" ON CONFLICT(origin_id) DO NOTHING;"
+    )
+
+
+def upsert_statement(table: str, row: Dict[str, Any], origin: str) -> str:
+    if table == ORIGIN_TABLE:
+        return origin_event_upsert(row, origin)
+    spec = SYNC_TABLES[table]
+    columns = spec["columns"]
+    values = ", ".join(sql_value(row[column]) for column in columns)
+    updates = ", ".join(
+        f"{column}=excluded.{column}"
+        for column in columns
+        if column not in spec["key"] and column != "created_at"
+    )
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+        f" ON CONFLICT({', '.join(spec['key'])}) DO UPDATE SET {updates};"
+    )
+
+
+def delete_statement(table: str, key: Dict[str, Any], origin: str) -> str:
+    if table == ORIGIN_TABLE:
+        return f"DELETE FROM {table} WHERE origin_id = {sql_value(origin_id(origin, key['id']))};"
+    columns = SYNC_TABLES[table]["key"]
+    return f"DELETE FROM {table} WHERE {_where(columns, [key.get(c) for c in columns])};"
+
+
+def read_high_water_mark(conn: sqlite3.Connection, target: str) -> int:
+    row = conn.execute("SELECT last_seq FROM sync_state WHERE target = ?", (target,)).fetchone()
+    return row[0] if row else 0
+
+
+def acknowledge(conn: sqlite3.Connection, target: str, seq: int) -> None:
+    """Record the new high-water mark and drop change-log entries it covers."""
+    now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    conn.execute(
+        """
+        INSERT INTO sync_state (target, last_seq, synced_at) VALUES (?, ?, ?)
+        ON CONFLICT(target) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq), synced_at = excluded.synced_at
+        """,
+        (target, seq, now),
+    )
+    # A single D1 target today; keep entries another target has not seen yet.
+    floor = conn.execute("SELECT MIN(last_seq) FROM sync_state").fetchone()[0] or 0
+    conn.execute("DELETE FROM change_log WHERE seq <= ?", (floor,))
+    conn.commit()
+
+
+def collect_changes(conn: sqlite3.Connection, since: int, origin: str) -> Tuple[List[str], int, Dict[str, int]]:
+    """Return delta statements (oldest first), the highest seq covered and per-table counts."""
+    rows = conn.execute(
+        """
+        SELECT table_name, row_key, MAX(seq) AS seq
+        FROM change_log
+        WHERE seq > ?
+        GROUP BY table_name, row_key
+        ORDER BY seq
+        """,
+        (since,),
+    ).fetchall()
+
+    statements: List[str] = []
+    counts: Dict[str, int] = {}
+    max_seq = since
+    for table, row_key, seq in rows:
+        max_seq = max(max_seq, seq)
+        if table not in SYNC_TABLES:
+            continue
+        spec = SYNC_TABLES[table]
+        key = json.loads(row_key)
+        if any(key.get(column) is None for column in spec["key"]):
+            continue  # logged under an older key layout; ensure_change_capture re-logged the row
+        columns = spec["columns"]
+        clause = " AND ".join(f"{column} IS ?" for column in spec["key"])
+        current = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {clause} LIMIT 1",
+            [key.get(column) for column in spec["key"]],
+        ).fetchone()
+        if current is None:
+            statements.append(delete_statement(table, key, origin))
+        else:
+            statements.append(upsert_statement(table, dict(zip(columns, current)), origin))
+        counts[table] = counts.get(table, 0) + 1
+    return statements, max_seq, counts
+
+
+def write_batches(statements: List[str], out_dir: Path, since: int, until: int, batch_size: int) -> List[Path]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index, start in enumerate(range(0, len(statements), batch_size), start=1):
+        path = out_dir / f"d1-delta-{since + 1}-{until}-{index:03d}.sql"
+        body = [f"-- portal.db change_log seq {since + 1}..{until}, batch {index} (safe to re-apply)"]
+        body.extend(statements[start:start + batch_size])
+        path.write_text("\n".join(body) + "\n", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def checksum_columns(table: str) -> List[str]:
+    if table == ORIGIN_TABLE:
+        return ["origin_id"] + [column for column in SYNC_TABLES[table]["columns"] if column != "id"]
+    return SYNC_TABLES[table]["columns"]
+
+
+def _local_keys(conn: sqlite3.Connection, table: str) -> List[Tuple[Any, ...]]:
+    key = SYNC_TABLES[table]["key"]
+    return [tuple(row) for row in conn.execute(f"SELECT {', '.join(key)} FROM {table} ORDER BY {', '.join(key)}")]
+
+
+def remote_checksum_query(conn: sqlite3.Connection, table: str, origin: str) -> str:
+    """D1 query limited to rows this database owns (the Worker writes the same tables)."""
+    columns = checksum_columns(table)
+    if table == ORIGIN_TABLE:
+        prefix = f"{origin}:"
+        where = f"substr(origin_id, 1, {len(prefix)}) = {sql_value(prefix)}"
+        order = "origin_id"
+    else:
+        key = SYNC_TABLES[table]["key"]
+        tuples = ", ".join(
+            "(" + ", ".join(sql_value(value) for value in values) + ")" for values in _local_keys(conn, table)
+        )
+        target = key[0] if len(key) == 1 else f"({', '.join(key)})"
+        where = f"{target} IN (VALUES {tuples})" if tuples else "0"
+        order = ", ".join(key)
+    return f"SELECT {', '.join(columns)} FROM {table} WHERE {where} ORDER BY {order};"
+
+
+def local_checksum_rows(conn: sqlite3.Connection, table: str, origin: str):
+    if table == ORIGIN_TABLE:
+        rest = [column for column in checksum_columns(table) if column != "origin_id"]
+        return conn.execute(
+            f"SELECT ? || ':' || id AS origin_id, {', '.join(rest)} FROM {table} ORDER BY origin_id",
+            (origin,),
+        )
+    key = SYNC_TABLES[table]["key"]
+    return conn.execute(f"SELECT {', '.join(checksum_columns(table))} FROM {table} ORDER BY {', '.join(key)}")
+
+
+def table_checksum(rows: Iterable[Sequence[Any]]) -> Dict[str, Any]:
+    digest = hashlib.sha256()
+    count = 0
+    for row in rows:
+        digest.update(json.dumps(list(row), separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+        count += 1
+    return {"rows": count, "sha256": digest.hexdigest()}
+
+
+def local_checksums(conn: sqlite3.Connection, origin: str) -> Dict[str, Dict[str, Any]]:
+    return {
+        table: table_checksum(local_checksum_rows(conn, table, origin))
+        for table in SYNC_TABLES
+    }
+
+
+def remote_checksums(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Checksum the output of `wrangler d1 execute --json --file <checksum query>`."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = [data]
+    result_sets = [entry.get("results") or [] for entry in data if isinstance(entry, dict)]
+    if len(result_sets) != len(SYNC_TABLES):
+        raise ValueError(f"Expected {len(SYNC_TABLES)} result sets, found {len(result_sets)}.")
+    checksums = {}
+    for table, results in zip(SYNC_TABLES, result_sets):
+        columns = checksum_columns(table)
+        checksums[table] = table_checksum([row.get(column) for column in columns] for row in results)
+    return checksums
+
+
+def open_db(db_path: Path) -> sqlite3.Connection:
+    if not db_path.exists():
+        raise SystemExit(f"Database not found: {db_path}")
+    conn = sqlite3.connect(db_path)
+    ensure_change_capture(conn)
+    return conn
+
+
+def cmd_emit(args) -> None:
+    conn = open_db(args.db)
+    try:
+        since = read_high_water_mark(conn, args.target)
+        statements, until, counts = collect_changes(conn, since, args.origin)
+        if not statements:
+            print(f"No changes since seq {since}.")
+            if until > since and args.advance:
+                acknowledge(conn, args.target, until)
+            return
+        paths = write_batches(statements, args.out, since, until, args.batch_size)
+        summary = ", ".join(f"{table}={count}" for table, count in sorted(counts.items()))
+        print(f"Wrote {len(statements)} statement(s) in {len(paths)} batch(es) for seq {since + 1}..{until} ({summary})")
+        for path in paths:
+            print(f"  {path}")
+        if args.advance:
+            acknowledge(conn, args.target, until)
+            print(f"High-water mark for '{args.target}' advanced to {until}")
+        else:
+            print(f"After applying, run: sync_d1.py ack --seq {until}")
+    finally:
+        conn.close()
+
+
+def cmd_ack(args) -> None:
+    conn = open_db(args.db)
+    try:
+        acknowledge(conn, args.target, args.seq)
+        print(f"High-water mark for '{args.target}' is now {read_high_water_mark(conn, args.target)}")
+    finally:
+        conn.close()
+
+
+def cmd_checksum(args) -> None:
+    conn = open_db(args.db)
+    try:
+        if args.print_query:
+            print("\n".join(remote_checksum_query(conn, table, args.origin) for table in SYNC_TABLES))
+            return
+        local = local_checksums(conn, args.origin)
+    finally:
+        conn.close()
+
+    if not args.remote:
+        print(json.dumps(local, indent=2))
+        return
+
+    remote = remote_checksums(args.remote)
+    mismatched = []
+    for table in SYNC_TABLES:
+        ok = local[table] == remote[table]
+        if not ok:
+            mismatched.append(table)
+        print(
+            f"{table:<14} local={local[table]['rows']:>6} remote={remote[table]['rows']:>6}"
+            f" {'OK' if ok else 'MISMATCH'}"
+        )
+    if mismatched:
+        raise SystemExit(f"Checksum mismatch: {', '.join(mismatched)}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Incremental portal.db -> D1 sync.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB_PATH,
+        help=f"Path to the portal SQLite DB (default: {DEFAULT_DB_PATH})",
+    )
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="Sync target name (default: d1)")
+    parser.add_argument(
+        "--origin",
+        help="Prefix for login_events.origin_id in D1 (default: the --db file stem, e.g. portal).",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    emit = sub.add_parser("emit", help="Write SQL batches for rows changed since the last sync.")
+    emit.add_argument("--out", type=Path, required=True, help="Directory for the batch .sql files.")
+    emit.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Statements per batch file.")
+    emit.add_argument("--advance", action="store_true", help="Advance the high-water mark immediately.")
+    emit.set_defaults(func=cmd_emit)
+
+    ack = sub.add_parser("ack", help="Advance the high-water mark after batches were applied.")
+    ack.add_argument("--seq", type=int, required=True, help="Last change_log seq that was applied.")
+    ack.set_defaults(func=cmd_ack)
+
+    checksum = sub.add_parser("checksum", help="Per-table row counts and hashes for verification.")
+    checksum.add_argument("--print-query", action="store_true", help="Print the SQL to run on D1.")
+    checksum.add_argument("--remote", type=Path, help="wrangler --json output of the checksum query.")
+    checksum.set_defaults(func=cmd_checksum)
+
+    args = parser.parse_args(argv)
+    args.origin = args.origin or args.db.stem
+    if getattr(args, "batch_size", 1) < 1:
+        raise SystemExit("--batch-size must be at least 1")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,9 @@ The source file should stay outside git to avoid committing student PII.
 Examples:
     python backend/scripts/update_emails.py /secure/path/roster-email-template.csv
     python backend/scripts/update_emails.py /secure/path/roster.json --d1-sql /tmp/d1-email-updates.sql
+
+With PORTAL_SHARDS / PORTAL_SHARD_PREFIXES set, each update goes to the shard the
+student ID routes to (see backend/portal_shards.py).
 """
 
 import argparse
@@ -13,10 +16,15 @@ import csv
 import json
 import os
 import sqlite3
+import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from portal_shards import ShardRouter  # noqa: E402
+
 DEFAULT_DB_PATH = Path(os.getenv("PORTAL_DB_PATH", Path(__file__).resolve().parent.parent / "portal.db"))
 
 
@@ -96,6 +104,21 @@ def update_database(records: List[Dict[str, Any]], db_path: Path) -> Tuple[int,
     return updated, missing
 
 
+def update_sharded(records: List[Dict[str, Any]], router: ShardRouter) -> Tuple[int, List[str]]:
+    """Group updates by the shard each student routes to and apply them per file."""
+    router.ensure_directory()
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for rec in records:
+        groups.setdefault(router.shard_for(rec["id"]), []).append(rec)
+    updated = 0
+    missing: List[str] = []
+    for shard, shard_records in groups.items():
+        shard_updated, shard_missing = update_database(shard_records, router.paths[shard])
+        updated += shard_updated
+        missing.extend(shard_missing)
+    return updated, missing
+
+
 def emit_d1_sql(records: List[Dict[str, Any]], sql_path: Path) -> None:
     """Emit UPDATE statements for Cloudflare D1."""
     if not records:
@@ -160,8 +183,12 @@ def main() -> None:
     if not records:
         raise SystemExit("No records contained an email or phone to update.")
 
-    updated, missing = update_database(records, args.db)
-    print(f"Updated {updated} student(s) in {args.db}")
+    try:
+        router = ShardRouter.from_env(args.db, os.getenv("PORTAL_SHARDS"), os.getenv("PORTAL_SHARD_PREFIXES"))
+    except ValueError as exc:
+        raise SystemExit(str(exc)) from exc
+    updated, missing = update_sharded(records, router)
+    print(f"Updated {updated} student(s) in {', '.join(str(path) for path in router.paths.values())}")
     if missing:
         print(f"Students not found (not updated): {', '.join(sorted(set(missing)))}")
 
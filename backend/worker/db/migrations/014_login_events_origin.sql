@@ -0,0 +1,5 @@
+-- Events mirrored from a backend portal.db carry "<origin>:<local id>" so
+-- same-second logins stay distinct and re-applied sync batches stay idempotent.
+-- Rows written by the Worker itself leave origin_id NULL.
+ALTER TABLE login_events ADD COLUMN origin_id TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_login_events_origin ON login_events (origin_id);
@@ -6,6 +6,13 @@ ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 BUILD_DIR="$ROOT_DIR/dist"
 PUBLIC_DIR="$ROOT_DIR/public"
 
+if command -v python3 >/dev/null 2>&1; then
+  echo "Building content-hashed asset manifest"
+  python3 "$ROOT_DIR/backend/scripts/build_asset_manifest.py"
+else
+  echo "python3 not available; skipping asset manifest"
+fi
+
 echo "Building static site into $BUILD_DIR"
 rm -rf "$BUILD_DIR"
 mkdir -p "$BUILD_DIR"